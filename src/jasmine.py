@@ -1,13 +1,26 @@
 #!/usr/bin/env python3
+import argparse
+import bisect
+import collections
+import concurrent.futures
 import configparser
+import contextlib
+import fcntl
+import functools
 import hashlib
 import json
+import mmap
+import multiprocessing
 import os
 import re
+import struct
 import subprocess
 import threading
+import time
 import shutil
 import random
+import stat as stat_module
+import zlib
 
 import gi
 try:
@@ -15,12 +28,17 @@ try:
     HAVE_CAIRO = True
 except Exception:
     HAVE_CAIRO = False
+try:
+    import numpy as np
+    HAVE_NUMPY = True
+except Exception:
+    HAVE_NUMPY = False
 
 gi.require_version("Gdk", "3.0")
 gi.require_version("Gtk", "3.0")
 gi.require_version("GdkPixbuf", "2.0")
 gi.require_version("Pango", "1.0")
-from gi.repository import Gdk, GdkPixbuf, Gtk, GLib, Pango
+from gi.repository import Gdk, GdkPixbuf, Gio, Gtk, GLib, Pango
 
 
 def build_wallpaper_tab(window):
@@ -107,7 +125,18 @@ def build_wallpaper_tab(window):
     thumb_scroll = Gtk.ScrolledWindow()
     thumb_scroll.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
     thumb_scroll.set_min_content_height(160)
-    thumb_scroll.add(window.thumb_flow)
+    window.thumb_viewport = Gtk.Viewport()
+    window.thumb_viewport.add(window.thumb_flow)
+    thumb_scroll.add(window.thumb_viewport)
+
+    # Virtualized grid for very large folders: a fixed pool of cells placed
+    # on a Gtk.Layout and rebound to model items as the view scrolls.
+    window.thumb_layout = Gtk.Layout()
+    window.thumb_layout.connect("size-allocate", window._on_thumb_layout_allocated)
+    thumb_adjustment = thumb_scroll.get_vadjustment()
+    thumb_adjustment.connect("value-changed", window._on_thumb_viewport_changed)
+    thumb_adjustment.connect("changed", window._on_thumb_viewport_changed)
+    window.thumb_scroll = thumb_scroll
     window.wallpaper_tab.pack_start(thumb_scroll, True, True, 0)
 
     apply_row = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL)
@@ -135,7 +164,61 @@ KEY_PATTERNS = {
     for key in KEY_COLORS
 }
 HEX_RE = re.compile(r"#[0-9a-fA-F]{6}")
-THUMBNAIL_CACHE_VERSION = "v4"
+MATUGEN_THEMES = [
+    "scheme-content",
+    "scheme-expressive",
+    "scheme-fidelity",
+    "scheme-fruit-salad",
+    "scheme-monochrome",
+    "scheme-neutral",
+    "scheme-rainbow",
+    "scheme-tonal-spot",
+]
+MATUGEN_MODES = ["dark", "light"]
+PREVIEW_BACKENDS = ["matugen", "numpy"]
+PALETTE_SOURCE_HEIGHT = 112
+PALETTE_SAMPLE_PIXELS = 16384
+# Rough HCT chroma per unit of OKLCH chroma, so Material's numbers carry over.
+MATERIAL_CHROMA_SCALE = 300.0
+# Score's answer when nothing in the image is colourful enough (Google blue).
+MATERIAL_FALLBACK_SOURCE = (0x42, 0x85, 0xF4)
+# key colour -> (tonal palette, dark tone, light tone), Material 3 roles.
+MATERIAL_KEY_TONES = {
+    "background": ("neutral", 6, 98),
+    "on_surface": ("neutral", 90, 10),
+    "on_background": ("neutral", 90, 10),
+    "primary": ("primary", 80, 40),
+    "primary_container": ("primary", 30, 90),
+    "secondary": ("secondary", 80, 40),
+    "tertiary": ("tertiary", 80, 40),
+}
+THUMBNAIL_CACHE_VERSION = "v8"
+THUMBNAIL_PACK_NAME = "thumbs.pack"
+THUMBNAIL_INDEX_NAME = "thumbs.idx"
+THUMBNAIL_LOCK_NAME = "thumbs.lock"
+THUMBNAIL_KEY = struct.Struct("<IQQqQ")
+THUMBNAIL_INDEX_RECORD = struct.Struct("<%dsQHHI" % THUMBNAIL_KEY.size)
+THUMBNAIL_EVICT_BATCH = 256
+# Compact once discarded tiles make up this much of the pack.
+THUMBNAIL_DEAD_FRACTION = 0.5
+# (corner radius, border rgba, border width) baked into cached thumbnails.
+THUMB_SIZE = (96, 64)
+THUMB_STYLE = (6, (1.0, 1.0, 1.0, 0.4), 2.0)
+PREVIEW_HEIGHT = 360
+PREVIEW_STYLE = (16, (1.0, 1.0, 1.0, 0.4), 2.0)
+PREVIEW_READ_CHUNK = 64 * 1024
+JPEG_EXTS = {"jpg", "jpeg", "jpe", "jfif"}
+# freedesktop.org thumbnail spec buckets, smallest first.
+SHARED_THUMBNAIL_SIZES = (("normal", 128), ("large", 256), ("x-large", 512), ("xx-large", 1024))
+PALETTE_CACHE_VERSION = "v1"
+PALETTE_CACHE_NAME = "palettes.json"
+PROXY_DIR_NAME = "proxies"
+PROXY_EDGE = 256
+THUMB_INSERT_BUDGET = 0.008
+THUMB_APPLY_BUDGET = 0.004
+THUMB_SPACING = 10
+VIRTUAL_MARGIN_ROWS = 3
+DEFAULT_THUMB_WORKERS = max(1, min(4, os.cpu_count() or 1))
 SIDEBAR_WIDTH = 220
 SWWW_TRANSITIONS = [
     "center",
@@ -170,6 +253,26 @@ def load_settings():
         "theme": main.get("theme", "scheme-tonal-spot"),
         "mode": main.get("mode", "dark"),
         "contrast": int(main.get("contrast", "0")),
+        "thumb_workers": max(1, int(main.get("thumb_workers", str(DEFAULT_THUMB_WORKERS)))),
+        "thumb_cache_max_mb": max(0, int(main.get("thumb_cache_max_mb", "256"))),
+        "thumb_cache_max_entries": max(0, int(main.get("thumb_cache_max_entries", "0"))),
+        "virtual_grid_threshold": max(0, int(main.get("virtual_grid_threshold", "2000"))),
+        "thumb_memory_mb": max(0, int(main.get("thumb_memory_mb", "64"))),
+        "preview_cache_mb": max(0, int(main.get("preview_cache_mb", "96"))),
+        "progressive_preview": main.getboolean("progressive_preview", True),
+        "selection_debounce_ms": max(0, int(main.get("selection_debounce_ms", "120"))),
+        "palette_cache_max_entries": max(0, int(main.get("palette_cache_max_entries", "2000"))),
+        "palette_explore_jobs": max(0, int(main.get("palette_explore_jobs", "2"))),
+        "contrast_settle_ms": max(0, int(main.get("contrast_settle_ms", "150"))),
+        "matugen_proxy": main.getboolean("matugen_proxy", True),
+        "proxy_cache_max_entries": max(0, int(main.get("proxy_cache_max_entries", "2000"))),
+        "preview_backend": (
+            main.get("preview_backend", "matugen")
+            if main.get("preview_backend", "matugen") in PREVIEW_BACKENDS
+            else "matugen"
+        ),
+        "use_shared_thumbnails": main.getboolean("use_shared_thumbnails", True),
+        "write_shared_thumbnails": main.getboolean("write_shared_thumbnails", False),
     }
 
 
@@ -182,6 +285,22 @@ def save_settings(values):
         "theme": values["theme"],
         "mode": values["mode"],
         "contrast": str(values["contrast"]),
+        "thumb_workers": str(values.get("thumb_workers", DEFAULT_THUMB_WORKERS)),
+        "thumb_cache_max_mb": str(values.get("thumb_cache_max_mb", 256)),
+        "thumb_cache_max_entries": str(values.get("thumb_cache_max_entries", 0)),
+        "virtual_grid_threshold": str(values.get("virtual_grid_threshold", 2000)),
+        "thumb_memory_mb": str(values.get("thumb_memory_mb", 64)),
+        "preview_cache_mb": str(values.get("preview_cache_mb", 96)),
+        "progressive_preview": str(values.get("progressive_preview", True)).lower(),
+        "selection_debounce_ms": str(values.get("selection_debounce_ms", 120)),
+        "palette_cache_max_entries": str(values.get("palette_cache_max_entries", 2000)),
+        "palette_explore_jobs": str(values.get("palette_explore_jobs", 2)),
+        "contrast_settle_ms": str(values.get("contrast_settle_ms", 150)),
+        "matugen_proxy": str(values.get("matugen_proxy", True)).lower(),
+        "proxy_cache_max_entries": str(values.get("proxy_cache_max_entries", 2000)),
+        "preview_backend": values.get("preview_backend", "matugen"),
+        "use_shared_thumbnails": str(values.get("use_shared_thumbnails", True)).lower(),
+        "write_shared_thumbnails": str(values.get("write_shared_thumbnails", False)).lower(),
     }
     with open(path, "w", encoding="utf-8") as handle:
         config.write(handle)
@@ -393,41 +512,506 @@ def _find_asset_dir():
     return "/usr/share/jasmine-wallpaper/assets"
 
 
+@functools.lru_cache(maxsize=None)
 def supported_image_exts():
     exts = set()
     for fmt in GdkPixbuf.Pixbuf.get_formats():
         for ext in fmt.get_extensions():
             exts.add(ext.lower())
-    return exts
+    return frozenset(exts)
+
+
+def scan_folder_images(folder):
+    # Filtering uses the d_type scandir already has; nothing is stat'ed yet.
+    exts = supported_image_exts()
+    with os.scandir(folder) as entries:
+        candidates = [
+            entry
+            for entry in entries
+            if entry.name.split(".")[-1].lower() in exts and entry.is_file()
+        ]
+    candidates.sort(key=lambda entry: entry.name.lower())
+    return candidates
+
+
+def iter_folder_images(entries):
+    # Each file is only stat'ed when the consumer gets to it.
+    for entry in entries:
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        yield entry.name, entry.path, stat
+
+
+def list_folder_images(folder):
+    return list(iter_folder_images(scan_folder_images(folder)))
 
 
 def thumbnail_cache_dir():
     return os.path.expanduser("~/.cache/jasmine")
 
 
-def thumbnail_cache_path(path, size):
-    try:
-        stat = os.stat(path)
-    except OSError:
-        stat = None
-    token = "%s|%s|%s" % (
-        path,
-        getattr(stat, "st_mtime", 0),
-        getattr(stat, "st_size", 0),
+@functools.lru_cache(maxsize=None)
+def thumbnail_variant(size, style):
+    token = "%sx%s|%r|%s" % (size[0], size[1], style, THUMBNAIL_CACHE_VERSION)
+    return zlib.crc32(token.encode("utf-8"))
+
+
+def thumbnail_cache_key(stat, size, style=None):
+    # Identity comes from the stat the caller already has, so lookups need
+    # no hashing of paths and no extra syscalls.
+    return THUMBNAIL_KEY.pack(
+        thumbnail_variant(size, style),
+        stat.st_dev,
+        stat.st_ino,
+        stat.st_mtime_ns,
+        stat.st_size,
     )
-    token = "%s|%sx%s|%s" % (token, size[0], size[1], THUMBNAIL_CACHE_VERSION)
-    digest = hashlib.sha1(token.encode("utf-8")).hexdigest()
-    return os.path.join(thumbnail_cache_dir(), digest + ".png")
 
 
-def load_thumbnail(path, size=(96, 64)):
-    cache_path = thumbnail_cache_path(path, size)
-    if os.path.exists(cache_path):
+class ThumbnailStore:
+    # Raw RGBA tiles appended to one pack file, with a fixed-size record per
+    # tile in a side index. The pack is mmapped so warm hits are page faults.
+    # jasmine warm may share the files with a running window, so every write
+    # happens under an flock on THUMBNAIL_LOCK_NAME (always taken before
+    # self._lock), and a pack or index replaced by the other process is
+    # picked up before the next write or remap.
+    def __init__(self, cache_dir):
+        self.pack_path = os.path.join(cache_dir, THUMBNAIL_PACK_NAME)
+        self.index_path = os.path.join(cache_dir, THUMBNAIL_INDEX_NAME)
+        self.lock_path = os.path.join(cache_dir, THUMBNAIL_LOCK_NAME)
+        self.max_bytes = 0
+        self.max_entries = 0
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._atimes = {}
+        self._discarded = set()
+        self._bytes = 0
+        self._pack_size = 0
+        self._dirty = False
+        self._evicting = False
+        self._map = None
+        self._map_size = 0
+        self._pack_id = None
+        self._index_id = None
+        self._index_seen = 0
         try:
-            return GdkPixbuf.Pixbuf.new_from_file(cache_path)
-        except Exception:
+            with self._file_lock(), self._lock:
+                self._load_index()
+                self._remap()
+        except OSError:
             pass
 
+    @contextlib.contextmanager
+    def _file_lock(self):
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        with open(self.lock_path, "a") as handle:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+    @staticmethod
+    def _identity(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None, 0
+        return (stat.st_dev, stat.st_ino), stat.st_size
+
+    def _load_index(self):
+        self._entries = {}
+        self._atimes = {}
+        self._bytes = 0
+        self._pack_id, self._pack_size = self._identity(self.pack_path)
+        self._index_id, _size = self._identity(self.index_path)
+        self._index_seen = 0
+        self._read_index(0)
+
+    def _read_index(self, start):
+        # Records from byte `start` on; entries we already hold (or dropped)
+        # win over what is on disk.
+        try:
+            pack_size = os.path.getsize(self.pack_path)
+        except OSError:
+            pack_size = 0
+        try:
+            with open(self.index_path, "rb") as handle:
+                handle.seek(start)
+                data = handle.read()
+        except OSError:
+            return
+        usable = len(data) - len(data) % THUMBNAIL_INDEX_RECORD.size
+        for record in THUMBNAIL_INDEX_RECORD.iter_unpack(data[:usable]):
+            key, offset, width, height, atime = record
+            # Skip records whose tile never made it to disk.
+            if offset + width * height * 4 > pack_size:
+                continue
+            if key in self._discarded:
+                continue
+            if key not in self._entries:
+                self._bytes += width * height * 4
+                self._entries[key] = (offset, width, height)
+            self._atimes[key] = max(atime, self._atimes.get(key, 0))
+        self._index_seen = start + usable
+
+    def _sync(self):
+        # Caller holds the file lock and self._lock.
+        pack_id, pack_size = self._identity(self.pack_path)
+        if pack_id != self._pack_id:
+            # Compacted elsewhere: every offset we hold is stale.
+            atimes = self._atimes
+            self._load_index()
+            for key in self._entries:
+                self._atimes[key] = max(self._atimes[key], atimes.get(key, 0))
+            self._remap()
+            return
+        # Tiles the other process appended count towards the pack size too.
+        self._pack_size = pack_size
+        index_id, index_size = self._identity(self.index_path)
+        if index_id != self._index_id:
+            self._index_id = index_id
+            self._read_index(0)
+        elif index_size > self._index_seen:
+            self._read_index(self._index_seen)
+
+    def _remap(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._map_size = 0
+        try:
+            with open(self.pack_path, "rb") as handle:
+                stat = os.fstat(handle.fileno())
+                if (stat.st_dev, stat.st_ino) != self._pack_id:
+                    return
+                if stat.st_size:
+                    self._map = mmap.mmap(
+                        handle.fileno(), stat.st_size, access=mmap.ACCESS_READ
+                    )
+                    self._map_size = stat.st_size
+        except (OSError, ValueError):
+            pass
+
+    def _read(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        offset, width, height = entry
+        end = offset + width * height * 4
+        if end > self._map_size:
+            return False
+        self._atimes[key] = int(time.time())
+        self._dirty = True
+        return width, height, self._map[offset:end]
+
+    def get(self, key):
+        with self._lock:
+            result = self._read(key)
+        if result is not False:
+            return result
+        # The tile lies past our mapping; remap under the file lock, after
+        # checking the pack was not swapped out from under the index.
+        try:
+            with self._file_lock(), self._lock:
+                self._sync()
+                self._remap()
+                result = self._read(key)
+        except OSError:
+            return None
+        return result or None
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def put(self, key, width, height, pixels):
+        with self._lock:
+            if key in self._entries:
+                return
+        atime = int(time.time())
+        try:
+            with self._file_lock(), self._lock:
+                self._sync()
+                if key in self._entries:
+                    return
+                with open(self.pack_path, "ab") as handle:
+                    offset = handle.seek(0, os.SEEK_END)
+                    handle.write(pixels)
+                if self._pack_id is None:
+                    self._pack_id, _size = self._identity(self.pack_path)
+                self._pack_size = offset + len(pixels)
+                with open(self.index_path, "ab") as handle:
+                    handle.write(
+                        THUMBNAIL_INDEX_RECORD.pack(key, offset, width, height, atime)
+                    )
+                self._index_id, self._index_seen = self._identity(self.index_path)
+                self._discarded.discard(key)
+                self._entries[key] = (offset, width, height)
+                self._atimes[key] = atime
+                self._bytes += width * height * 4
+        except OSError:
+            return
+        if self._over_budget():
+            self.evict_async()
+
+    def discard(self, key):
+        # The tile becomes dead space in the pack until the next compaction.
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return
+            self._discarded.add(key)
+            self._atimes.pop(key, None)
+            self._bytes -= entry[1] * entry[2] * 4
+            self._dirty = True
+        if self._over_budget():
+            self.evict_async()
+
+    def set_budget(self, max_bytes, max_entries):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        if self._over_budget():
+            self.evict_async()
+
+    def _over_budget(self):
+        # The file on disk is what the budget protects, dead tiles included.
+        if self.max_bytes and max(self._bytes, self._pack_size) > self.max_bytes:
+            return True
+        if self._pack_size - self._bytes > self._pack_size * THUMBNAIL_DEAD_FRACTION:
+            return True
+        return bool(self.max_entries and len(self._entries) > self.max_entries)
+
+    def _write_index(self, entries, path):
+        with open(path, "wb") as handle:
+            for key, (offset, width, height) in entries.items():
+                atime = self._atimes.get(key, 0)
+                handle.write(
+                    THUMBNAIL_INDEX_RECORD.pack(key, offset, width, height, atime)
+                )
+
+    def flush(self):
+        # Access times only live in memory until the index is rewritten.
+        with self._lock:
+            if not self._dirty:
+                return
+        try:
+            with self._file_lock(), self._lock:
+                # Fold in whatever the other process appended first.
+                self._sync()
+                tmp_path = self.index_path + ".tmp"
+                self._write_index(self._entries, tmp_path)
+                os.replace(tmp_path, self.index_path)
+                self._index_id, self._index_seen = self._identity(self.index_path)
+                self._dirty = False
+        except OSError:
+            return
+
+    def evict_async(self):
+        with self._lock:
+            if self._evicting:
+                return
+            self._evicting = True
+        thread = threading.Thread(target=self._evict, daemon=True)
+        thread.start()
+
+    def _evict(self):
+        try:
+            self.evict()
+        finally:
+            with self._lock:
+                self._evicting = False
+
+    def evict(self):
+        try:
+            with self._file_lock():
+                self._compact()
+        except (OSError, ValueError):
+            pass
+
+    def _compact(self):
+        # Keep the most recently used tiles down to 90% of the budget, copy
+        # them into a fresh pack in small batches, then swap it in. Runs with
+        # the file lock held, so no tile can be appended meanwhile.
+        with self._lock:
+            self._sync()
+            if not self._over_budget():
+                return
+            ranked = sorted(
+                self._entries.items(),
+                key=lambda item: self._atimes.get(item[0], 0),
+                reverse=True,
+            )
+            byte_limit = int(self.max_bytes * 0.9) if self.max_bytes else None
+            entry_limit = int(self.max_entries * 0.9) if self.max_entries else None
+            keep = []
+            used = 0
+            for key, entry in ranked:
+                size = entry[1] * entry[2] * 4
+                if byte_limit is not None and used + size > byte_limit:
+                    break
+                if entry_limit is not None and len(keep) >= entry_limit:
+                    break
+                keep.append((key, entry))
+                used += size
+            source_handle = open(self.pack_path, "rb")
+
+        tmp_path = self.pack_path + ".tmp"
+        new_entries = {}
+        with source_handle, open(tmp_path, "wb") as out:
+            source = mmap.mmap(source_handle.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                for start in range(0, len(keep), THUMBNAIL_EVICT_BATCH):
+                    for key, (offset, width, height) in keep[start : start + THUMBNAIL_EVICT_BATCH]:
+                        new_entries[key] = (out.tell(), width, height)
+                        out.write(source[offset : offset + width * height * 4])
+                    time.sleep(0.005)
+            finally:
+                source.close()
+            out.flush()
+
+        with self._lock:
+            # Tiles discarded while we were copying stay gone.
+            new_entries = {
+                key: entry for key, entry in new_entries.items() if key in self._entries
+            }
+            index_tmp_path = self.index_path + ".tmp"
+            self._write_index(new_entries, index_tmp_path)
+            os.replace(tmp_path, self.pack_path)
+            os.replace(index_tmp_path, self.index_path)
+            self._entries = new_entries
+            self._atimes = {key: self._atimes.get(key, 0) for key in new_entries}
+            self._bytes = sum(w * h * 4 for _offset, w, h in new_entries.values())
+            self._discarded = set()
+            self._dirty = False
+            self._pack_id, self._pack_size = self._identity(self.pack_path)
+            self._index_id, self._index_seen = self._identity(self.index_path)
+            self._remap()
+
+
+_thumbnail_store = None
+_thumbnail_store_lock = threading.Lock()
+
+
+def thumbnail_store():
+    global _thumbnail_store
+    with _thumbnail_store_lock:
+        if _thumbnail_store is None:
+            _thumbnail_store = ThumbnailStore(thumbnail_cache_dir())
+        return _thumbnail_store
+
+
+def pixbuf_to_rgba_bytes(pixbuf):
+    if not pixbuf.get_has_alpha():
+        pixbuf = pixbuf.add_alpha(False, 0, 0, 0)
+    width = pixbuf.get_width()
+    height = pixbuf.get_height()
+    stride = pixbuf.get_rowstride()
+    data = pixbuf.read_pixel_bytes().get_data()
+    row = width * 4
+    if stride == row:
+        return bytes(data[: row * height])
+    return b"".join(data[y * stride : y * stride + row] for y in range(height))
+
+
+def pixbuf_from_rgba_bytes(width, height, data):
+    return GdkPixbuf.Pixbuf.new_from_bytes(
+        GLib.Bytes.new(data), GdkPixbuf.Colorspace.RGB, True, 8, width, height, width * 4
+    )
+
+
+def _exif_thumbnail_bytes(tiff):
+    if tiff[:2] == b"II":
+        endian = "<"
+    elif tiff[:2] == b"MM":
+        endian = ">"
+    else:
+        return None
+    try:
+        ifd0 = struct.unpack_from(endian + "I", tiff, 4)[0]
+        count = struct.unpack_from(endian + "H", tiff, ifd0)[0]
+        ifd1 = struct.unpack_from(endian + "I", tiff, ifd0 + 2 + count * 12)[0]
+        if not ifd1:
+            return None
+        count = struct.unpack_from(endian + "H", tiff, ifd1)[0]
+        offset = length = None
+        for idx in range(count):
+            tag, _kind, _n, value = struct.unpack_from(
+                endian + "HHII", tiff, ifd1 + 2 + idx * 12
+            )
+            if tag == 0x0201:
+                offset = value
+            elif tag == 0x0202:
+                length = value
+    except struct.error:
+        return None
+    if not offset or not length or offset + length > len(tiff):
+        return None
+    data = tiff[offset : offset + length]
+    if not data.startswith(b"\xff\xd8"):
+        return None
+    return data
+
+
+def read_exif_thumbnail(path):
+    # Walk the JPEG markers up to the first scan looking for an Exif APP1
+    # segment, and return the JPEG thumbnail stored in its IFD1.
+    try:
+        with open(path, "rb") as handle:
+            if handle.read(2) != b"\xff\xd8":
+                return None
+            while True:
+                marker = handle.read(2)
+                if len(marker) < 2 or marker[0] != 0xFF:
+                    return None
+                code = marker[1]
+                if code == 0xFF:
+                    handle.seek(-1, os.SEEK_CUR)
+                    continue
+                if code == 0x01 or 0xD0 <= code <= 0xD8:
+                    continue
+                if code in (0xD9, 0xDA):
+                    return None
+                length = struct.unpack(">H", handle.read(2))[0]
+                if length < 2:
+                    return None
+                if code == 0xE1:
+                    segment = handle.read(length - 2)
+                    if segment.startswith(b"Exif\x00\x00"):
+                        return _exif_thumbnail_bytes(segment[6:])
+                else:
+                    handle.seek(length - 2, os.SEEK_CUR)
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def load_exif_thumbnail(path, width, height, size):
+    data = read_exif_thumbnail(path)
+    if not data:
+        return None
+    loader = GdkPixbuf.PixbufLoader.new_with_type("jpeg")
+    try:
+        loader.write(data)
+        loader.close()
+    except Exception:
+        return None
+    thumb = loader.get_pixbuf()
+    if thumb is None:
+        return None
+    thumb_w = thumb.get_width()
+    thumb_h = thumb.get_height()
+    if thumb_w < size[0] or thumb_h < size[1]:
+        return None
+    # Cameras often letterbox the embedded thumbnail; only trust it when the
+    # aspect ratio matches the real image.
+    if abs(thumb_w * height - thumb_h * width) > 0.03 * width * thumb_h:
+        return None
+    return thumb
+
+
+def decode_thumbnail(path, size):
     target_w, target_h = size
     info = GdkPixbuf.Pixbuf.get_file_info(path)
     if info and info[1] and info[2]:
@@ -435,12 +1019,26 @@ def load_thumbnail(path, size=(96, 64)):
         scale = max(target_w / float(width), target_h / float(height))
         scaled_w = max(1, int(width * scale + 0.5))
         scaled_h = max(1, int(height * scale + 0.5))
-        try:
-            pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(
-                path, scaled_w, scaled_h, False
-            )
-        except Exception:
-            return None
+        pixbuf = None
+        if path.rsplit(".", 1)[-1].lower() in JPEG_EXTS:
+            # A broken Exif block just means a normal decode.
+            try:
+                pixbuf = load_exif_thumbnail(path, width, height, size)
+                if pixbuf is not None:
+                    pixbuf = pixbuf.scale_simple(
+                        scaled_w, scaled_h, GdkPixbuf.InterpType.BILINEAR
+                    )
+            except Exception:
+                pixbuf = None
+        if pixbuf is None:
+            # For JPEG this goes through a size-prepared loader, which lets
+            # libjpeg decode at 1/2, 1/4 or 1/8 scale in the DCT domain.
+            try:
+                pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(
+                    path, scaled_w, scaled_h, False
+                )
+            except Exception:
+                return None
         pixbuf = crop_center_pixbuf(pixbuf, size)
     else:
         try:
@@ -454,15 +1052,318 @@ def load_thumbnail(path, size=(96, 64)):
         pixbuf = pixbuf.scale_simple(
             target_w, target_h, GdkPixbuf.InterpType.BILINEAR
         )
+    return pixbuf
+
+
+def shared_thumbnail_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "thumbnails")
 
-    os.makedirs(thumbnail_cache_dir(), exist_ok=True)
+
+def shared_thumbnail_name(path):
+    uri = GLib.filename_to_uri(os.path.abspath(path), None)
+    return uri, hashlib.md5(uri.encode("utf-8")).hexdigest() + ".png"
+
+
+def scale_to_cover(pixbuf, size):
+    target_w, target_h = size
+    width = pixbuf.get_width()
+    height = pixbuf.get_height()
+    scale = max(target_w / float(width), target_h / float(height))
+    scaled_w = max(target_w, int(width * scale + 0.5))
+    scaled_h = max(target_h, int(height * scale + 0.5))
+    pixbuf = pixbuf.scale_simple(scaled_w, scaled_h, GdkPixbuf.InterpType.BILINEAR)
+    return crop_center_pixbuf(pixbuf, size)
+
+
+def _covers(pixbuf, size):
+    return pixbuf.get_width() >= size[0] and pixbuf.get_height() >= size[1]
+
+
+def load_shared_thumbnail(path, stat, size):
+    uri, name = shared_thumbnail_name(path)
+    mtime = str(int(stat.st_mtime))
+    base = shared_thumbnail_dir()
+    for folder, _edge in SHARED_THUMBNAIL_SIZES:
+        try:
+            pixbuf = GdkPixbuf.Pixbuf.new_from_file(os.path.join(base, folder, name))
+        except Exception:
+            continue
+        if pixbuf.get_option("tEXt::Thumb::MTime") != mtime:
+            continue
+        thumb_uri = pixbuf.get_option("tEXt::Thumb::URI")
+        if thumb_uri and thumb_uri != uri:
+            continue
+        if not _covers(pixbuf, size):
+            continue
+        return scale_to_cover(pixbuf, size)
+    return None
+
+
+def create_shared_thumbnail(path, stat, size):
+    # Decode once at the spec's "normal" size, publish it for other apps and
+    # derive our own crop from it.
+    folder, edge = SHARED_THUMBNAIL_SIZES[0]
+    info = GdkPixbuf.Pixbuf.get_file_info(path)
+    if not info or not info[1] or not info[2]:
+        return None
+    if info[1] <= edge and info[2] <= edge:
+        return None
     try:
-        pixbuf.savev(cache_path, "png", [], [])
+        pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(path, edge, edge, True)
+    except Exception:
+        return None
+    uri, name = shared_thumbnail_name(path)
+    target_dir = os.path.join(shared_thumbnail_dir(), folder)
+    tmp_path = os.path.join(target_dir, ".%s.jasmine-%d" % (name, os.getpid()))
+    try:
+        os.makedirs(target_dir, mode=0o700, exist_ok=True)
+        pixbuf.savev(
+            tmp_path,
+            "png",
+            ["tEXt::Thumb::URI", "tEXt::Thumb::MTime", "tEXt::Thumb::Size", "tEXt::Software"],
+            [uri, str(int(stat.st_mtime)), str(stat.st_size), "jasmine"],
+        )
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, os.path.join(target_dir, name))
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+    if not _covers(pixbuf, size):
+        return None
+    return scale_to_cover(pixbuf, size)
+
+
+def render_thumbnail(path, stat, size, style, use_shared, write_shared):
+    pixbuf = None
+    if use_shared:
+        pixbuf = load_shared_thumbnail(path, stat, size)
+    if pixbuf is None and write_shared:
+        pixbuf = create_shared_thumbnail(path, stat, size)
+    if pixbuf is None:
+        pixbuf = decode_thumbnail(path, size)
+    if pixbuf is None:
+        return None
+    if style is not None:
+        pixbuf = style_thumbnail(pixbuf, style)
+    return pixbuf
+
+
+def load_thumbnail(
+    path, size=(96, 64), style=None, stat=None, use_shared=False, write_shared=False
+):
+    if stat is None:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+    store = thumbnail_store()
+    key = thumbnail_cache_key(stat, size, style)
+    cached = store.get(key)
+    if cached is not None:
+        try:
+            return pixbuf_from_rgba_bytes(*cached)
+        except Exception:
+            pass
+
+    pixbuf = render_thumbnail(path, stat, size, style, use_shared, write_shared)
+    if pixbuf is None:
+        return None
+    try:
+        store.put(
+            key, pixbuf.get_width(), pixbuf.get_height(), pixbuf_to_rgba_bytes(pixbuf)
+        )
     except Exception:
         pass
     return pixbuf
 
 
+def _warm_render(job):
+    # Runs in a pool process; the parent owns the pack file and does the writes.
+    path, stat, use_shared, write_shared = job
+    try:
+        pixbuf = render_thumbnail(
+            path, stat, THUMB_SIZE, THUMB_STYLE, use_shared, write_shared
+        )
+        if pixbuf is None:
+            return None
+        key = thumbnail_cache_key(stat, THUMB_SIZE, THUMB_STYLE)
+        return key, pixbuf.get_width(), pixbuf.get_height(), pixbuf_to_rgba_bytes(pixbuf)
+    except Exception:
+        return None
+
+
+def warm_thumbnail_cache(folder, jobs=None, settings=None):
+    if settings is None:
+        settings = load_settings()
+    ensure_thumbnail_cache(THUMBNAIL_CACHE_VERSION)
+    store = thumbnail_store()
+    pending = []
+    for _name, path, stat in list_folder_images(folder):
+        if thumbnail_cache_key(stat, THUMB_SIZE, THUMB_STYLE) in store:
+            continue
+        pending.append(
+            (
+                path,
+                stat,
+                settings["use_shared_thumbnails"],
+                settings["write_shared_thumbnails"],
+            )
+        )
+    written = 0
+    if pending:
+        with multiprocessing.Pool(jobs) as pool:
+            for result in pool.imap_unordered(_warm_render, pending, chunksize=8):
+                if result is not None:
+                    store.put(*result)
+                    written += 1
+    store.max_bytes = settings["thumb_cache_max_mb"] * 1024 * 1024
+    store.max_entries = settings["thumb_cache_max_entries"]
+    store.evict()
+    store.flush()
+    return written
+
+
+def load_preview_pixbuf(path, height, is_cancelled=None):
+    # Feed the file through a size-prepared loader so the decoder can scale
+    # while decoding, checking for cancellation between chunks.
+    loader = GdkPixbuf.PixbufLoader()
+
+    def on_size_prepared(_loader, width, source_height):
+        if source_height > 0:
+            scale = height / float(source_height)
+            loader.set_size(max(1, int(width * scale)), height)
+
+    loader.connect("size-prepared", on_size_prepared)
+    try:
+        with open(path, "rb") as handle:
+            while True:
+                if is_cancelled is not None and is_cancelled():
+                    raise InterruptedError(path)
+                chunk = handle.read(PREVIEW_READ_CHUNK)
+                if not chunk:
+                    break
+                loader.write(chunk)
+        loader.close()
+    except Exception:
+        try:
+            loader.close()
+        except Exception:
+            pass
+        return None
+    pixbuf = loader.get_pixbuf()
+    if pixbuf is None or pixbuf.get_height() <= 0:
+        return None
+    if pixbuf.get_height() != height:
+        scale = height / float(pixbuf.get_height())
+        width = max(1, int(pixbuf.get_width() * scale))
+        pixbuf = pixbuf.scale_simple(width, height, GdkPixbuf.InterpType.BILINEAR)
+    return pixbuf
+
+
+def progressive_preview_pixbuf(thumb, path, height):
+    # Stretch the grid tile up to preview size as a stand-in while the real
+    # decode runs; trim the tile's own border and corners first.
+    inset = int(THUMB_STYLE[2]) + 1
+    width = thumb.get_width() - 2 * inset
+    thumb_h = thumb.get_height() - 2 * inset
+    if width <= 0 or thumb_h <= 0:
+        return None
+    thumb = GdkPixbuf.Pixbuf.new_subpixbuf(thumb, inset, inset, width, thumb_h)
+    info = GdkPixbuf.Pixbuf.get_file_info(path)
+    if info and info[1] and info[2]:
+        target_w = max(1, int(info[1] * height / float(info[2])))
+    else:
+        target_w = max(1, int(width * height / float(thumb_h)))
+    pixbuf = scale_to_cover(thumb, (target_w, height))
+    return style_thumbnail(pixbuf, PREVIEW_STYLE)
+
+
+def thumb_index_in_direction(index, total, cols, direction):
+    rows = max(1, (total + cols - 1) // cols)
+    row = index // cols
+    col = index % cols
+
+    if direction == "left":
+        if col > 0:
+            col -= 1
+        else:
+            row = (row - 1) % rows
+            col = min(cols - 1, total - 1 - row * cols)
+    elif direction == "right":
+        row_len = min(cols, total - row * cols)
+        if col < row_len - 1:
+            col += 1
+        else:
+            row = (row + 1) % rows
+            col = 0
+    elif direction == "up":
+        row = (row - 1) % rows
+    elif direction == "down":
+        row = (row + 1) % rows
+
+    row_len = min(cols, total - row * cols)
+    col = min(col, max(0, row_len - 1))
+    return row * cols + col
+
+
+class PreviewCache:
+    # Finished (scaled, rounded, bordered) preview pixbufs, least recently
+    # used first, capped by pixel memory.
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key):
+        with self._lock:
+            pixbuf = self._entries.get(key)
+            if pixbuf is not None:
+                self._entries.move_to_end(key)
+            return pixbuf
+
+    def put(self, key, pixbuf):
+        size = pixbuf.get_rowstride() * pixbuf.get_height()
+        if not self.max_bytes or size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.get_rowstride() * old.get_height()
+            self._entries[key] = pixbuf
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _key, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.get_rowstride() * evicted.get_height()
+
+
+def preview_cache_key(path, stat):
+    if stat is None:
+        return (path, 0, 0)
+    return (path, stat.st_mtime_ns, stat.st_size)
+
+
+def thumb_priority(index, cols, pitch, view_top, view_height):
+    # 0 = visible, 1 = within the next screenful either way, and so on.
+    top = (index // cols) * pitch
+    bottom = top + pitch
+    view_bottom = view_top + view_height
+    if bottom > view_top and top < view_bottom:
+        return 0
+    if top >= view_bottom:
+        distance = top - view_bottom
+    else:
+        distance = view_top - bottom
+    return 1 + int(distance // max(1.0, view_height))
+
+
 def hex_to_rgba(hex_color, alpha):
     value = hex_color.lstrip("#")
     if len(value) != 6:
@@ -499,6 +1400,12 @@ def round_pixbuf(pixbuf, radius):
     return Gdk.pixbuf_get_from_surface(surface, 0, 0, width, height)
 
 
+def style_thumbnail(pixbuf, style):
+    radius, color, width_px = style
+    pixbuf = round_pixbuf(pixbuf, radius)
+    return add_border(pixbuf, radius, color=color, width_px=width_px)
+
+
 def crop_center_pixbuf(pixbuf, size):
     if pixbuf is None:
         return pixbuf
@@ -524,7 +1431,10 @@ def ensure_thumbnail_cache(version):
     if os.path.isdir(cache_dir):
         try:
             for name in os.listdir(cache_dir):
-                if name.endswith(".png"):
+                if name.endswith(".png") or name in (
+                    THUMBNAIL_PACK_NAME,
+                    THUMBNAIL_INDEX_NAME,
+                ):
                     try:
                         os.remove(os.path.join(cache_dir, name))
                     except Exception:
@@ -589,13 +1499,526 @@ def parse_matugen_output(output, mode):
                         entry.setdefault("dark", hexes[0])
                 break
 
-    resolved = {}
-    for name in KEY_COLORS:
-        entry = colors_by_name.get(name)
-        if not entry:
-            continue
-        resolved[name] = entry.get(mode, "")
-    return resolved
+    resolved = {}
+    for name in KEY_COLORS:
+        entry = colors_by_name.get(name)
+        if not entry:
+            continue
+        resolved[name] = entry.get(mode, "")
+    return resolved
+
+
+def srgb_to_oklab(rgb):
+    rgb = np.asarray(rgb, dtype=np.float64)
+    linear = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    lms = linear @ np.array(
+        [
+            [0.4122214708, 0.2119034982, 0.0883024619],
+            [0.5363325363, 0.6806995451, 0.2817188376],
+            [0.0514459929, 0.1073969566, 0.6299787005],
+        ]
+    )
+    return np.cbrt(lms) @ np.array(
+        [
+            [0.2104542553, 1.9779984951, 0.0259040371],
+            [0.7936177850, -2.4285922050, 0.7827717662],
+            [-0.0040720468, 0.4505937099, -0.8086757660],
+        ]
+    )
+
+
+def oklab_to_linear_srgb(lab):
+    lms = np.asarray(lab, dtype=np.float64) @ np.array(
+        [
+            [1.0, 1.0, 1.0],
+            [0.3963377774, -0.1055613458, -0.0894841775],
+            [0.2158037573, -0.0638541728, -1.2914855480],
+        ]
+    )
+    return (lms ** 3) @ np.array(
+        [
+            [4.0767416621, -1.2684380046, -0.0041960863],
+            [-3.3077115913, 2.6097574011, -0.7034186147],
+            [0.2309699292, -0.3413193965, 1.7076147010],
+        ]
+    )
+
+
+def oklch_to_hex(lightness, chroma, hue):
+    # Vectorised over colours; chroma is bisected down until each lands
+    # inside sRGB, which keeps hue and lightness intact.
+    lightness = np.asarray(lightness, dtype=np.float64)
+    radians = np.radians(np.asarray(hue, dtype=np.float64))
+    low = np.zeros_like(lightness)
+    high = np.asarray(chroma, dtype=np.float64) + np.zeros_like(lightness)
+
+    def to_rgb(c):
+        lab = np.stack([lightness, c * np.cos(radians), c * np.sin(radians)], axis=-1)
+        return oklab_to_linear_srgb(lab)
+
+    def in_gamut(c):
+        rgb = to_rgb(c)
+        return np.all((rgb >= -1e-4) & (rgb <= 1 + 1e-4), axis=-1)
+
+    inside = in_gamut(high)
+    for _step in range(16):
+        mid = (low + high) / 2
+        ok = in_gamut(mid)
+        low = np.where(ok, mid, low)
+        high = np.where(ok, high, mid)
+    chroma = np.where(inside, high, low)
+    linear = np.clip(to_rgb(chroma), 0.0, 1.0)
+    rgb = np.where(linear <= 0.0031308, linear * 12.92, 1.055 * linear ** (1 / 2.4) - 0.055)
+    values = np.rint(np.clip(rgb, 0.0, 1.0) * 255).astype(int)
+    return ["#%02x%02x%02x" % tuple(value) for value in values.reshape(-1, 3)]
+
+
+def oklch_source_color(rgba):
+    # Material's source colour pick on 15-bit buckets: hues shared by much of
+    # the image win, nudged towards chroma near 48.
+    opaque = rgba[rgba[:, 3] == 255, :3]
+    if not len(opaque):
+        return fallback_source_color()
+    buckets = (opaque >> 3).astype(np.int32)
+    packed = (buckets[:, 0] << 10) | (buckets[:, 1] << 5) | buckets[:, 2]
+    bins, counts = np.unique(packed, return_counts=True)
+    rgb = np.stack([(bins >> 10) & 31, (bins >> 5) & 31, bins & 31], axis=1) * 8 + 4
+    lab = srgb_to_oklab(rgb / 255.0)
+    chroma = np.hypot(lab[:, 1], lab[:, 2])
+    hue = np.degrees(np.arctan2(lab[:, 2], lab[:, 1])) % 360.0
+    hue_bins = hue.astype(np.int64) % 360
+    hue_counts = np.bincount(hue_bins, weights=counts, minlength=360)
+    # Each hue is excited by its neighbours within 15 degrees.
+    excited = sum(np.roll(hue_counts, shift) for shift in range(-15, 16))
+    proportion = excited[hue_bins] / float(counts.sum())
+    material_chroma = chroma * MATERIAL_CHROMA_SCALE
+    score = proportion * 70.0 + np.where(
+        material_chroma < 48, 0.1, 0.3
+    ) * (material_chroma - 48)
+    usable = (material_chroma >= 5) & (proportion >= 0.01)
+    if not np.any(usable):
+        # Greys have no real hue; match matugen rather than amplify noise.
+        return fallback_source_color()
+    best = int(np.argmax(np.where(usable, score, -np.inf)))
+    return float(lab[best, 0]), float(material_chroma[best]), float(hue[best])
+
+
+def fallback_source_color():
+    lab = srgb_to_oklab(np.array(MATERIAL_FALLBACK_SOURCE) / 255.0)
+    chroma = float(np.hypot(lab[1], lab[2]))
+    hue = float(np.degrees(np.arctan2(lab[2], lab[1])) % 360.0)
+    return float(lab[0]), chroma * MATERIAL_CHROMA_SCALE, hue
+
+
+def material_scheme_palettes(theme, hue, chroma):
+    # (hue, chroma) of each tonal palette, after the matugen/Material variants.
+    if theme in ("scheme-content", "scheme-fidelity"):
+        return {
+            "primary": (hue, chroma),
+            "secondary": (hue, max(chroma - 32.0, chroma * 0.5)),
+            "tertiary": (hue + 60.0, chroma),
+            "neutral": (hue, chroma / 8.0),
+        }
+    if theme == "scheme-expressive":
+        return {
+            "primary": (hue + 240.0, 40.0),
+            "secondary": (hue + 45.0, 24.0),
+            "tertiary": (hue + 120.0, 32.0),
+            "neutral": (hue + 15.0, 8.0),
+        }
+    if theme == "scheme-fruit-salad":
+        return {
+            "primary": (hue - 50.0, 48.0),
+            "secondary": (hue - 50.0, 36.0),
+            "tertiary": (hue, 36.0),
+            "neutral": (hue, 10.0),
+        }
+    if theme == "scheme-monochrome":
+        return {
+            "primary": (hue, 0.0),
+            "secondary": (hue, 0.0),
+            "tertiary": (hue, 0.0),
+            "neutral": (hue, 0.0),
+        }
+    if theme == "scheme-neutral":
+        return {
+            "primary": (hue, 12.0),
+            "secondary": (hue, 8.0),
+            "tertiary": (hue, 16.0),
+            "neutral": (hue, 2.0),
+        }
+    if theme == "scheme-rainbow":
+        return {
+            "primary": (hue, 48.0),
+            "secondary": (hue, 16.0),
+            "tertiary": (hue + 60.0, 24.0),
+            "neutral": (hue, 0.0),
+        }
+    return {
+        "primary": (hue, 36.0),
+        "secondary": (hue, 16.0),
+        "tertiary": (hue + 60.0, 24.0),
+        "neutral": (hue, 6.0),
+    }
+
+
+def numpy_palette(pixbuf, theme, mode, contrast):
+    rgba = np.frombuffer(pixbuf_to_rgba_bytes(pixbuf), dtype=np.uint8).reshape(-1, 4)
+    step = max(1, len(rgba) // PALETTE_SAMPLE_PIXELS)
+    _lightness, chroma, hue = oklch_source_color(rgba[::step])
+    palettes = material_scheme_palettes(theme, hue, chroma)
+    lightness = []
+    chromas = []
+    hues = []
+    for key in KEY_COLORS:
+        palette, dark_tone, light_tone = MATERIAL_KEY_TONES[key]
+        tone = dark_tone if mode == "dark" else light_tone
+        if key != "background" and not key.endswith("_container"):
+            # Foreground roles move away from the background as contrast rises.
+            tone += 10 * contrast if mode == "dark" else -10 * contrast
+        tone = min(100.0, max(0.0, tone))
+        palette_hue, palette_chroma = palettes[palette]
+        # Tone is CIE L*; for a neutral that maps exactly onto OKLab L.
+        if tone > 8:
+            lightness.append((tone + 16.0) / 116.0)
+        else:
+            lightness.append((tone / 903.3) ** (1 / 3.0))
+        chromas.append(palette_chroma / MATERIAL_CHROMA_SCALE)
+        hues.append(palette_hue % 360.0)
+    return dict(zip(KEY_COLORS, oklch_to_hex(lightness, chromas, hues)))
+
+
+@functools.lru_cache(maxsize=None)
+def matugen_version():
+    try:
+        result = subprocess.run(
+            [resolve_binary("matugen"), "--version"],
+            capture_output=True,
+            text=True,
+            check=False,
+            timeout=5,
+        )
+    except Exception:
+        return ""
+    return (result.stdout or result.stderr or "").strip()
+
+
+def matugen_preview_args(path, theme, mode, contrast, structured=True):
+    args = [resolve_binary("matugen"), "image", path, "--dry-run"]
+    if structured:
+        args += ["--json", "hex"]
+    else:
+        args += ["--show-colors"]
+    return args + ["-t", theme, "-m", mode, "--contrast", str(contrast)]
+
+
+def _json_hex(value):
+    if isinstance(value, dict):
+        value = value.get("color", value.get("hex"))
+    if isinstance(value, str):
+        match = HEX_RE.search(value)
+        if match:
+            return match.group(0).lower()
+    return None
+
+
+def parse_matugen_json(output):
+    # matugen has shipped both colors.<mode>.<name> and
+    # colors.<name>.<mode>{color}; accept either and return every mode.
+    start = output.find("{")
+    if start < 0:
+        return {}
+    try:
+        data, _end = json.JSONDecoder().raw_decode(output, start)
+    except ValueError:
+        return {}
+    colors = data.get("colors") if isinstance(data, dict) else None
+    if not isinstance(colors, dict):
+        return {}
+    palettes = {}
+    for mode in MATUGEN_MODES:
+        by_mode = colors.get(mode)
+        palette = {}
+        for key in KEY_COLORS:
+            if isinstance(by_mode, dict) and key in by_mode:
+                color = _json_hex(by_mode[key])
+            else:
+                by_name = colors.get(key)
+                color = _json_hex(by_name.get(mode)) if isinstance(by_name, dict) else None
+            if color:
+                palette[key] = color
+        if palette:
+            palettes[mode] = palette
+    return palettes
+
+
+_matugen_json = {"supported": True}
+
+
+def spawn_matugen(args):
+    return subprocess.Popen(
+        args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+
+
+def run_matugen_preview(path, theme, mode, contrast, start=spawn_matugen):
+    # {mode: palette} for every mode the run produced, or None when start
+    # declined or the process was killed. path may be a preview proxy.
+    structured = _matugen_json["supported"]
+    proc = start(matugen_preview_args(path, theme, mode, contrast, structured))
+    if proc is None:
+        return None
+    stdout, stderr = proc.communicate()
+    if proc.returncode < 0:
+        return None
+    if structured:
+        palettes = parse_matugen_json(stdout or "")
+        if palettes or "--json" not in (stderr or ""):
+            return palettes
+        # Older matugen without --json; fall back to the text table for good.
+        _matugen_json["supported"] = False
+        return run_matugen_preview(path, theme, mode, contrast, start)
+    palette = parse_matugen_output((stdout or "") + "\n" + (stderr or ""), mode)
+    return {mode: palette} if palette and proc.returncode == 0 else {}
+
+
+def palette_cache_key(path, stat, theme, mode, contrast):
+    if stat is None:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+    return json.dumps(
+        [path, stat.st_mtime_ns, stat.st_size, theme, mode, contrast, matugen_version()]
+    )
+
+
+class PaletteCache:
+    # Parsed matugen palettes on disk as one JSON file, least recently used
+    # first. A version mismatch drops the whole file. jasmine warm and the
+    # window share it, so flush merges with the file under an flock.
+    def __init__(self, path, max_entries=2000):
+        self.path = path
+        self.lock_path = os.path.splitext(path)[0] + ".lock"
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = self._read()
+        self._touched = set()
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        with open(self.lock_path, "a") as handle:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+    def _read(self):
+        entries = collections.OrderedDict()
+        try:
+            with open(self.path, "r", encoding="utf-8") as handle:
+                data = json.load(handle)
+        except Exception:
+            return entries
+        if not isinstance(data, dict) or data.get("version") != PALETTE_CACHE_VERSION:
+            return entries
+        for item in data.get("entries", []):
+            try:
+                key, palette = item
+            except Exception:
+                continue
+            if isinstance(key, str) and isinstance(palette, dict):
+                entries[key] = palette
+        return entries
+
+    def get(self, key):
+        with self._lock:
+            palette = self._entries.get(key)
+            if palette is not None:
+                self._entries.move_to_end(key)
+                self._touched.add(key)
+            return palette
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def put(self, key, palette):
+        if not key or not palette:
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = dict(palette)
+            self._touched.add(key)
+            self._trim(self._entries)
+
+    def _trim(self, entries):
+        if self.max_entries:
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def flush(self):
+        with self._lock:
+            if not self._touched:
+                return
+        tmp_path = "%s.%d.tmp" % (self.path, os.getpid())
+        try:
+            with self._file_lock(), self._lock:
+                # Start from what is on disk now, so entries the other
+                # process wrote since we loaded survive; ours go on top.
+                merged = self._read()
+                for key, palette in self._entries.items():
+                    if key in self._touched:
+                        merged.pop(key, None)
+                        merged[key] = palette
+                self._trim(merged)
+                data = {
+                    "version": PALETTE_CACHE_VERSION,
+                    "entries": [[key, palette] for key, palette in merged.items()],
+                }
+                with open(tmp_path, "w", encoding="utf-8") as handle:
+                    json.dump(data, handle, separators=(",", ":"))
+                os.replace(tmp_path, self.path)
+                self._entries = merged
+                self._touched = set()
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+_palette_cache = None
+_palette_cache_lock = threading.Lock()
+
+
+def palette_cache():
+    global _palette_cache
+    with _palette_cache_lock:
+        if _palette_cache is None:
+            _palette_cache = PaletteCache(
+                os.path.join(thumbnail_cache_dir(), PALETTE_CACHE_NAME)
+            )
+        return _palette_cache
+
+
+def preview_proxy_dir():
+    return os.path.join(thumbnail_cache_dir(), PROXY_DIR_NAME)
+
+
+def preview_proxy_path(path, stat):
+    token = "%s|%d|%d" % (path, stat.st_mtime_ns, stat.st_size)
+    name = hashlib.sha1(token.encode("utf-8", "surrogateescape")).hexdigest()
+    return os.path.join(preview_proxy_dir(), name + ".png")
+
+
+def ensure_preview_proxy(path, stat=None):
+    # matugen shrinks its input before quantising anyway, so a small PNG
+    # gives the same colours without decoding the full wallpaper each time.
+    if stat is None:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+    proxy = preview_proxy_path(path, stat)
+    try:
+        os.utime(proxy)
+        return proxy
+    except OSError:
+        pass
+    # The window and jasmine warm may both write proxies; keep temp names
+    # unique per process and thread.
+    tmp_path = "%s.%d-%d.tmp" % (proxy, os.getpid(), threading.get_ident())
+    try:
+        pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(path, PROXY_EDGE, PROXY_EDGE, True)
+        os.makedirs(os.path.dirname(proxy), exist_ok=True)
+        pixbuf.savev(tmp_path, "png", [], [])
+        os.replace(tmp_path, proxy)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return None
+    return proxy
+
+
+def prune_preview_proxies(max_entries):
+    # Proxies are touched on use, so the oldest mtimes go first.
+    if not max_entries:
+        return
+    try:
+        entries = [
+            (entry.stat().st_mtime, entry.path)
+            for entry in os.scandir(preview_proxy_dir())
+            if entry.name.endswith(".png")
+        ]
+    except OSError:
+        return
+    if len(entries) <= max_entries:
+        return
+    entries.sort()
+    for _mtime, proxy in entries[: len(entries) - max_entries]:
+        try:
+            os.remove(proxy)
+        except OSError:
+            pass
+
+
+def matugen_source(path, stat, use_proxy):
+    if use_proxy:
+        return ensure_preview_proxy(path, stat) or path
+    return path
+
+
+def store_matugen_palettes(path, stat, theme, contrast, palettes):
+    cache = palette_cache()
+    for mode, palette in palettes.items():
+        cache.put(palette_cache_key(path, stat, theme, mode, contrast), palette)
+
+
+def run_matugen_palette(path, theme, mode, contrast, stat=None, use_proxy=True):
+    key = palette_cache_key(path, stat, theme, mode, contrast)
+    palette = palette_cache().get(key) if key else None
+    if palette is not None:
+        return palette
+    try:
+        source = matugen_source(path, stat, use_proxy)
+        palettes = run_matugen_preview(source, theme, mode, contrast) or {}
+    except Exception:
+        return {}
+    store_matugen_palettes(path, stat, theme, contrast, palettes)
+    return palettes.get(mode, {})
+
+
+def warm_palette_cache(folder, jobs=None, settings=None):
+    if settings is None:
+        settings = load_settings()
+    cache = palette_cache()
+    cache.max_entries = settings["palette_cache_max_entries"]
+    theme, mode, contrast = settings["theme"], settings["mode"], settings["contrast"]
+    pending = [
+        (path, stat)
+        for _name, path, stat in list_folder_images(folder)
+        if palette_cache_key(path, stat, theme, mode, contrast) not in cache
+    ]
+    written = 0
+    if pending:
+        # matugen does the work in its own process; threads just keep N busy.
+        workers = jobs or DEFAULT_THUMB_WORKERS
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(
+                lambda job: run_matugen_palette(
+                    job[0], theme, mode, contrast, job[1], settings["matugen_proxy"]
+                ),
+                pending,
+            )
+            written = sum(1 for palette in results if palette)
+    cache.flush()
+    prune_preview_proxies(settings["proxy_cache_max_entries"])
+    return written
 
 
 def set_widget_color(widget, color):
@@ -619,6 +2042,21 @@ def ensure_value_in_list(value, options):
         return [value] + list(options)
     return list(options)
 
+class ThumbItem:
+    # Model entry for the virtualized grid. Carries the same attributes the
+    # FlowBox path keeps on each FlowBoxChild; image_widget is whichever
+    # recycled cell currently shows it, if any.
+    def __init__(self, name, path, stat):
+        self.image_name = name
+        self.image_path = path
+        self.image_stat = stat
+        self.image_widget = None
+        self.image_loaded = False
+        self.image_removed = False
+        self.thumb_requested = False
+        self.thumb_pixbuf = None
+
+
 class MatugenWindow(Gtk.Window):
     def __init__(self):
         super().__init__(title="Jasmine 🍚")
@@ -626,8 +2064,54 @@ class MatugenWindow(Gtk.Window):
         self.settings = load_settings()
         self.swww_settings = load_swww_settings_from_config()
         self._request_id = 0
+        self._preview_request_id = 0
+        self._preview_child = None
+        self._preview_pending = None
+        self._preview_stand_in_id = None
+        self._preview_shown_id = None
+        self._selection_settle_id = None
+        self._matugen_lock = threading.Lock()
+        self._matugen_procs = {}
+        self._palette_flush_id = None
+        self._palette_source = None
+        self._palette_jobs = 0
+        self._palette_rerun_pending = False
+        self._contrast_settle_id = None
+        self._contrast_applied = self.settings["contrast"]
+        self._settings_save_id = None
+        self._explore_id = 0
+        self._explore_token = None
+        self._explore_procs = set()
+        palette_cache().max_entries = self.settings["palette_cache_max_entries"]
+        # Resolve the version key off the main thread before the first lookup.
+        threading.Thread(target=matugen_version, daemon=True).start()
+        threading.Thread(
+            target=prune_preview_proxies,
+            args=(self.settings["proxy_cache_max_entries"],),
+            daemon=True,
+        ).start()
+        self._prefetch_id = 0
         self._thumb_request_id = 0
-        self._thumb_shimmer_id = None
+        self._thumb_animating = set()
+        self._thumb_loaded = {}
+        self._thumb_budget_id = None
+        self._thumb_lock = threading.Lock()
+        self._thumb_pending = collections.deque()
+        self._thumb_pending_request = 0
+        self._thumb_active_workers = 0
+        self._thumb_results = collections.deque()
+        self._thumb_drain_scheduled = False
+        self._thumb_children = []
+        self._thumb_rerank_id = None
+        self._thumb_by_path = {}
+        self._thumb_stream_id = None
+        self._thumb_virtual = False
+        self._thumb_selected = None
+        self._virtual_cells = []
+        self._virtual_bound = {}
+        self._virtual_relayout_id = None
+        self._virtual_width = 0
+        self._folder_monitor = None
         self.settings_window = None
         self._palette_provider = None
         self._current_folder = None
@@ -637,8 +2121,14 @@ class MatugenWindow(Gtk.Window):
         if settings is not None:
             settings.set_property("gtk-tooltip-timeout", 300)
 
+        self._preview_cache = PreviewCache(self.settings["preview_cache_mb"] * 1024 * 1024)
         ensure_thumbnail_cache(THUMBNAIL_CACHE_VERSION)
+        thumbnail_store().set_budget(
+            self.settings["thumb_cache_max_mb"] * 1024 * 1024,
+            self.settings["thumb_cache_max_entries"],
+        )
         self._thumb_placeholders = self._create_thumb_placeholders()
+        self._thumb_placeholder_anim = self._create_thumb_placeholder_anim()
 
         self._build_ui()
         self._apply_styles()
@@ -646,6 +2136,20 @@ class MatugenWindow(Gtk.Window):
 
         self.add_events(Gdk.EventMask.KEY_PRESS_MASK)
         self.connect("key-press-event", self._on_keypress)
+        self.connect("destroy", self._on_destroy)
+        self.connect("map", self._on_map_changed)
+        self.connect("unmap", self._on_map_changed)
+
+    def _on_map_changed(self, _window):
+        self._update_thumb_shimmer()
+
+    def _on_destroy(self, _window):
+        self._cancel_matugen()
+        self._cancel_palette_explore()
+        if self._settings_save_id is not None:
+            self._save_settings_now()
+        thumbnail_store().flush()
+        palette_cache().flush()
 
     def _build_ui(self):
         self.set_decorated(False)
@@ -761,16 +2265,7 @@ class MatugenWindow(Gtk.Window):
         matugen_settings.pack_start(theme_label, False, False, 0)
 
         self.theme_combo = Gtk.ComboBoxText()
-        themes = [
-            "scheme-content",
-            "scheme-expressive",
-            "scheme-fidelity",
-            "scheme-fruit-salad",
-            "scheme-monochrome",
-            "scheme-neutral",
-            "scheme-rainbow",
-            "scheme-tonal-spot",
-        ]
+        themes = MATUGEN_THEMES
         theme_labels = [theme.replace("scheme-", "", 1) for theme in themes]
         self._theme_values = themes
         for label in theme_labels:
@@ -787,7 +2282,7 @@ class MatugenWindow(Gtk.Window):
         matugen_settings.pack_start(mode_label, False, False, 0)
 
         self.mode_combo = Gtk.ComboBoxText()
-        for mode in ["dark", "light"]:
+        for mode in MATUGEN_MODES:
             self.mode_combo.append_text(mode)
         if self.settings["mode"] in ("dark", "light"):
             self.mode_combo.set_active(0 if self.settings["mode"] == "dark" else 1)
@@ -807,6 +2302,7 @@ class MatugenWindow(Gtk.Window):
         self.contrast_scale.set_value(self.settings["contrast"])
         self.contrast_scale.set_digits(0)
         self.contrast_scale.connect("value-changed", self._on_contrast_changed)
+        self.contrast_scale.connect("button-release-event", self._on_contrast_released)
         contrast_row.pack_start(self.contrast_scale, True, True, 0)
 
         self.contrast_value = Gtk.Label(label=str(self.settings["contrast"]))
@@ -876,6 +2372,15 @@ class MatugenWindow(Gtk.Window):
 
         return [base, shimmer_frame(-10), shimmer_frame(30)]
 
+    def _create_thumb_placeholder_anim(self):
+        if len(self._thumb_placeholders) < 2:
+            return None
+        anim = GdkPixbuf.PixbufSimpleAnim.new(96, 64, 1000.0 / 140)
+        for frame in self._thumb_placeholders:
+            anim.add_frame(frame)
+        anim.set_loop(True)
+        return anim
+
     def _choose_folder(self, _button=None):
         dialog = Gtk.FileChooserDialog(
             title="Select Image Folder",
@@ -901,107 +2406,587 @@ class MatugenWindow(Gtk.Window):
     def _load_images(self, folder, select_first=True, fade_preview=True):
         self._thumb_request_id += 1
         thumb_request_id = self._thumb_request_id
+        self._thumb_children = []
+        self._thumb_animating = set()
+        self._thumb_loaded = {}
+        with self._thumb_lock:
+            self._thumb_pending.clear()
+        self._thumb_by_path = {}
+        self._watch_folder(None)
+        if self._thumb_stream_id is not None:
+            GLib.source_remove(self._thumb_stream_id)
+            self._thumb_stream_id = None
         for child in self.thumb_flow.get_children():
             self.thumb_flow.remove(child)
+        self._thumb_selected = None
+        self._relayout_virtual_grid()
 
         if not os.path.isdir(folder):
             return
+        # Monitor events carry normalized absolute paths; match them exactly.
+        folder = os.path.normpath(os.path.abspath(folder))
         self._current_folder = folder
 
-        exts = supported_image_exts()
-        files = [
-            name
-            for name in os.listdir(folder)
-            if os.path.isfile(os.path.join(folder, name))
-            and name.split(".")[-1].lower() in exts
-        ]
-        files.sort(key=str.lower)
+        try:
+            entries = scan_folder_images(folder)
+        except OSError:
+            return
+        threshold = self.settings["virtual_grid_threshold"]
+        self._set_thumb_virtual(bool(threshold) and len(entries) >= threshold)
+        images = iter_folder_images(entries)
+        self._watch_folder(folder)
+        state = {"first": True}
+
+        def insert_batch():
+            # Insert one frame's worth of children per call so the window keeps
+            # painting while a large folder streams in.
+            if thumb_request_id != self._thumb_request_id:
+                return False
+            deadline = time.monotonic() + THUMB_INSERT_BUDGET
+            batch = []
+            done = False
+            while not done and time.monotonic() < deadline:
+                try:
+                    name, path, stat = next(images)
+                except (StopIteration, OSError):
+                    done = True
+                    break
+                if path in self._thumb_by_path:
+                    continue
+                child = self._create_thumb_child(name, path, stat)
+                self._insert_thumb_child(child)
+                batch.append(child)
+            if batch:
+                self._start_thumb_loader(batch, thumb_request_id)
+                self._update_thumb_shimmer()
+            if state["first"] and self._thumb_children:
+                state["first"] = False
+                if select_first:
+                    first = self._thumb_children[0]
+                    self._select_thumb(first)
+                    self._set_preview_from_child(first, fade_preview=fade_preview)
+            if done:
+                self._thumb_stream_id = None
+                return False
+            return True
 
-        new_children = []
-        for name in files:
-            path = os.path.join(folder, name)
-            image = Gtk.Image.new_from_pixbuf(self._thumb_placeholders[0])
-            image.set_size_request(96, 64)
-            child = Gtk.FlowBoxChild()
-            child.set_size_request(96, 64)
-            child.set_halign(Gtk.Align.CENTER)
-            child.set_valign(Gtk.Align.CENTER)
-            child.get_style_context().add_class("thumb-cell")
-            child.add(image)
-            child.set_tooltip_text(name)
-            child.image_path = path
-            child.image_widget = image
-            child.image_loaded = False
-            self.thumb_flow.add(child)
-            new_children.append(child)
-
-        self.thumb_flow.show_all()
-        if new_children:
-            self._start_thumb_shimmer(new_children, thumb_request_id)
-            self._start_thumb_loader(new_children, thumb_request_id)
-        children = self.thumb_flow.get_children()
-        if select_first and children:
-            self.thumb_flow.select_child(children[0])
-            self._set_preview_from_child(children[0], fade_preview=fade_preview)
+        if insert_batch():
+            self._thumb_stream_id = GLib.idle_add(insert_batch)
+
+    def _create_thumb_child(self, name, path, stat):
+        if self._thumb_virtual:
+            return ThumbItem(name, path, stat)
+        image = Gtk.Image.new_from_pixbuf(self._thumb_placeholders[0])
+        image.set_size_request(96, 64)
+        child = Gtk.FlowBoxChild()
+        child.set_size_request(96, 64)
+        child.set_halign(Gtk.Align.CENTER)
+        child.set_valign(Gtk.Align.CENTER)
+        child.get_style_context().add_class("thumb-cell")
+        child.add(image)
+        child.set_tooltip_text(name)
+        child.image_name = name
+        child.image_path = path
+        child.image_stat = stat
+        child.image_widget = image
+        child.image_loaded = False
+        child.image_removed = False
+        child.thumb_requested = False
+        child.thumb_pixbuf = None
+        return child
+
+    def _insert_thumb_child(self, child):
+        index = bisect.bisect_left(
+            self._thumb_children,
+            child.image_name.lower(),
+            key=lambda item: item.image_name.lower(),
+        )
+        self._thumb_children.insert(index, child)
+        self._thumb_by_path[child.image_path] = child
+        if self._thumb_virtual:
+            self._queue_virtual_relayout()
+        else:
+            self.thumb_flow.insert(child, index)
+            child.show_all()
+        return index
+
+    def _selected_thumb(self):
+        if self._thumb_virtual:
+            return self._thumb_selected
+        selected = self.thumb_flow.get_selected_children()
+        return selected[0] if selected else None
+
+    def _select_thumb(self, child):
+        if not self._thumb_virtual:
+            self.thumb_flow.select_child(child)
+            return
+        self._thumb_selected = child
+        for cell in self._virtual_cells:
+            context = cell.get_style_context()
+            if cell.thumb_item is child:
+                context.add_class("thumb-cell-selected")
+            else:
+                context.remove_class("thumb-cell-selected")
+        self._scroll_to_thumb(child)
+
+    def _scroll_to_thumb(self, child):
+        try:
+            index = self._thumb_children.index(child)
+        except ValueError:
+            return
+        pitch = self._thumb_row_pitch()
+        top = (index // self._thumb_columns()) * pitch
+        adjustment = self.thumb_scroll.get_vadjustment()
+        value = adjustment.get_value()
+        page = adjustment.get_page_size()
+        if top < value:
+            adjustment.set_value(top)
+        elif top + pitch > value + page:
+            adjustment.set_value(top + pitch - page)
+
+    def _set_thumb_virtual(self, virtual):
+        if virtual == self._thumb_virtual:
+            return
+        self._thumb_virtual = virtual
+        current = self.thumb_scroll.get_child()
+        if current is not None:
+            self.thumb_scroll.remove(current)
+        if virtual:
+            self.thumb_scroll.add(self.thumb_layout)
+            self.thumb_layout.show()
+        else:
+            self.thumb_scroll.add(self.thumb_viewport)
+            self.thumb_viewport.show_all()
+
+    def _on_thumb_layout_allocated(self, _layout, allocation):
+        # Only a width change moves cells; moving cells itself reallocates.
+        if allocation.width != self._virtual_width:
+            self._virtual_width = allocation.width
+            self._queue_virtual_relayout()
+
+    def _queue_virtual_relayout(self):
+        if self._virtual_relayout_id is None:
+            self._virtual_relayout_id = GLib.idle_add(self._relayout_virtual_grid)
+
+    def _relayout_virtual_grid(self):
+        # Indices shift on insert/remove, so drop every binding and rebind.
+        if self._virtual_relayout_id is not None:
+            GLib.source_remove(self._virtual_relayout_id)
+            self._virtual_relayout_id = None
+        for cell in self._virtual_bound.values():
+            self._unbind_virtual_cell(cell)
+        self._virtual_bound = {}
+        if not self._thumb_virtual:
+            return False
+        cols = self._thumb_columns()
+        rows = (len(self._thumb_children) + cols - 1) // cols
+        width = max(1, self.thumb_layout.get_allocated_width())
+        self.thumb_layout.set_size(width, max(1, rows * self._thumb_row_pitch()))
+        self._update_virtual_grid()
+        return False
+
+    def _update_virtual_grid(self):
+        if not self._thumb_virtual:
+            return
+        pitch = self._thumb_row_pitch()
+        cols = self._thumb_columns()
+        start, end = self._visible_thumb_range(VIRTUAL_MARGIN_ROWS)
+
+        for index in list(self._virtual_bound):
+            if index < start or index >= end:
+                self._unbind_virtual_cell(self._virtual_bound.pop(index))
+        free = [cell for cell in self._virtual_cells if cell.thumb_item is None]
+        grid_width = cols * THUMB_SIZE[0] + (cols - 1) * THUMB_SPACING
+        offset = max(0, (self.thumb_layout.get_allocated_width() - grid_width) // 2)
+        for index in range(start, end):
+            if index in self._virtual_bound:
+                continue
+            cell = free.pop() if free else self._create_virtual_cell()
+            x = offset + (index % cols) * (THUMB_SIZE[0] + THUMB_SPACING)
+            y = (index // cols) * pitch
+            self.thumb_layout.move(cell, x, y)
+            self._bind_virtual_cell(cell, self._thumb_children[index])
+            self._virtual_bound[index] = cell
+
+    def _create_virtual_cell(self):
+        cell = Gtk.EventBox()
+        cell.set_size_request(*THUMB_SIZE)
+        cell.get_style_context().add_class("thumb-cell")
+        cell.image = Gtk.Image()
+        cell.image.set_size_request(*THUMB_SIZE)
+        cell.add(cell.image)
+        cell.thumb_item = None
+        cell.connect("button-press-event", self._on_virtual_cell_pressed)
+        self.thumb_layout.put(cell, 0, 0)
+        self._virtual_cells.append(cell)
+        return cell
+
+    def _bind_virtual_cell(self, cell, item):
+        self._thumb_animating.discard(item)
+        cell.thumb_item = item
+        item.image_widget = cell.image
+        cell.image.set_from_pixbuf(item.thumb_pixbuf or self._thumb_placeholders[0])
+        cell.set_tooltip_text(item.image_name)
+        context = cell.get_style_context()
+        if item is self._thumb_selected:
+            context.add_class("thumb-cell-selected")
+        else:
+            context.remove_class("thumb-cell-selected")
+        cell.show_all()
+
+    def _unbind_virtual_cell(self, cell):
+        if cell.thumb_item is not None:
+            self._thumb_animating.discard(cell.thumb_item)
+            cell.thumb_item.image_widget = None
+        cell.thumb_item = None
+        cell.hide()
+
+    def _on_virtual_cell_pressed(self, cell, _event):
+        if cell.thumb_item is None:
+            return False
+        self._select_thumb(cell.thumb_item)
+        self._set_preview_from_child(cell.thumb_item)
+        return True
+
+    def _watch_folder(self, folder):
+        if self._folder_monitor is not None:
+            self._folder_monitor.cancel()
+            self._folder_monitor = None
+        if folder is None:
+            return
+        try:
+            monitor = Gio.File.new_for_path(folder).monitor_directory(
+                Gio.FileMonitorFlags.WATCH_MOVES, None
+            )
+        except GLib.Error:
+            return
+        monitor.connect("changed", self._on_folder_changed)
+        self._folder_monitor = monitor
+
+    def _on_folder_changed(self, _monitor, file, other_file, event):
+        # CREATED is ignored on purpose: CHANGES_DONE_HINT follows once the
+        # writer is finished, so we never decode half-copied files.
+        if event in (Gio.FileMonitorEvent.DELETED, Gio.FileMonitorEvent.MOVED_OUT):
+            self._remove_thumb(file.get_path())
+        elif event in (
+            Gio.FileMonitorEvent.CHANGES_DONE_HINT,
+            Gio.FileMonitorEvent.MOVED_IN,
+        ):
+            self._refresh_thumb(file.get_path())
+        elif event == Gio.FileMonitorEvent.RENAMED:
+            # Same inode, mtime and size: the cached tile is still good.
+            self._remove_thumb(file.get_path(), discard=False)
+            if other_file is not None:
+                self._refresh_thumb(other_file.get_path())
+
+    def _remove_thumb(self, path, discard=True):
+        child = self._thumb_by_path.pop(path, None)
+        if child is None:
+            return
+        child.image_removed = True
+        self._thumb_animating.discard(child)
+        self._thumb_loaded.pop(child, None)
+        if discard:
+            thumbnail_store().discard(
+                thumbnail_cache_key(child.image_stat, THUMB_SIZE, THUMB_STYLE)
+            )
+        index = bisect.bisect_left(
+            self._thumb_children,
+            child.image_name.lower(),
+            key=lambda item: item.image_name.lower(),
+        )
+        while index < len(self._thumb_children) and self._thumb_children[index] is not child:
+            index += 1
+        if index < len(self._thumb_children):
+            del self._thumb_children[index]
+        was_selected = child is self._selected_thumb()
+        if self._thumb_virtual:
+            if was_selected:
+                self._thumb_selected = None
+            self._queue_virtual_relayout()
+        else:
+            self.thumb_flow.remove(child)
+        if was_selected and self._thumb_children:
+            new_child = self._thumb_children[min(index, len(self._thumb_children) - 1)]
+            self._select_thumb(new_child)
+            self._set_preview_from_child(new_child)
+
+    def _refresh_thumb(self, path):
+        if path is None or os.path.dirname(path) != self._current_folder:
+            return
+        name = os.path.basename(path)
+        if name.split(".")[-1].lower() not in supported_image_exts():
+            return
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._remove_thumb(path)
+            return
+        if not stat_module.S_ISREG(stat.st_mode):
+            self._remove_thumb(path)
+            return
+
+        child = self._thumb_by_path.get(path)
+        if child is not None:
+            old = child.image_stat
+            if (old.st_ino, old.st_mtime_ns, old.st_size) == (
+                stat.st_ino,
+                stat.st_mtime_ns,
+                stat.st_size,
+            ):
+                return
+            thumbnail_store().discard(
+                thumbnail_cache_key(old, THUMB_SIZE, THUMB_STYLE)
+            )
+            child.image_stat = stat
+            self._unload_thumb(child)
+        else:
+            child = self._create_thumb_child(name, path, stat)
+            self._insert_thumb_child(child)
+        self._start_thumb_loader([child], self._thumb_request_id)
+        self._update_thumb_shimmer()
+        if child is self._selected_thumb():
+            self._set_preview_from_child(child, fade_preview=False)
 
     def _start_thumb_loader(self, children, request_id):
-        def worker():
+        # Workers are shared across loads; a new request just swaps the queue.
+        with self._thumb_lock:
+            if self._thumb_pending_request != request_id:
+                self._thumb_pending.clear()
+                self._thumb_pending_request = request_id
+            self._thumb_pending.extend(children)
             for child in children:
-                if request_id != self._thumb_request_id:
+                child.thumb_requested = True
+            spawn = min(
+                self.settings["thumb_workers"] - self._thumb_active_workers,
+                len(self._thumb_pending),
+            )
+            spawn = max(0, spawn)
+            self._thumb_active_workers += spawn
+        for _ in range(spawn):
+            thread = threading.Thread(target=self._thumb_worker, daemon=True)
+            thread.start()
+
+    def _thumb_columns(self):
+        cols = self.thumb_flow.get_max_children_per_line()
+        if cols <= 0:
+            cols = 4
+        return cols
+
+    def _thumb_row_pitch(self):
+        spacing = self.thumb_flow.get_row_spacing()
+        if self._thumb_virtual:
+            return THUMB_SIZE[1] + THUMB_SPACING
+        if self._thumb_children:
+            height = self._thumb_children[0].get_allocated_height()
+            if height > 1:
+                return height + spacing
+        return 64 + spacing
+
+    def _visible_thumb_range(self, margin_rows=0):
+        adjustment = self.thumb_scroll.get_vadjustment()
+        pitch = self._thumb_row_pitch()
+        cols = self._thumb_columns()
+        value = adjustment.get_value()
+        first_row = max(0, int(value // pitch) - margin_rows)
+        last_row = int((value + adjustment.get_page_size()) // pitch) + margin_rows
+        return first_row * cols, min(len(self._thumb_children), (last_row + 1) * cols)
+
+    def _on_thumb_viewport_changed(self, _adjustment):
+        self._update_virtual_grid()
+        if self._thumb_rerank_id is None:
+            self._thumb_rerank_id = GLib.idle_add(self._on_thumb_viewport_idle)
+
+    def _on_thumb_viewport_idle(self):
+        self._thumb_rerank_id = None
+        self._requeue_visible_thumbs()
+        self._update_thumb_shimmer()
+        self._rerank_thumb_queue()
+        return False
+
+    def _rerank_thumb_queue(self):
+        adjustment = self.thumb_scroll.get_vadjustment()
+        view_top = adjustment.get_value()
+        view_height = adjustment.get_page_size()
+        if view_height <= 0 or not self._thumb_children:
+            return False
+        cols = self._thumb_columns()
+        pitch = self._thumb_row_pitch()
+        ranks = {}
+        for index, child in enumerate(self._thumb_children):
+            tier = thumb_priority(index, cols, pitch, view_top, view_height)
+            ranks[child] = (tier, index)
+        with self._thumb_lock:
+            if self._thumb_pending:
+                pending = sorted(
+                    self._thumb_pending, key=lambda child: ranks.get(child, (0, 0))
+                )
+                self._thumb_pending = collections.deque(pending)
+        return False
+
+    def _next_pending_thumb(self):
+        with self._thumb_lock:
+            if not self._thumb_pending:
+                self._thumb_active_workers -= 1
+                return None, None
+            return self._thumb_pending.popleft(), self._thumb_pending_request
+
+    def _thumb_worker(self):
+        # _next_pending_thumb gives the slot back when the queue drains; if
+        # anything else ends the thread, give it back here.
+        released = False
+        try:
+            while True:
+                child, request_id = self._next_pending_thumb()
+                if child is None:
+                    released = True
                     return
+                if request_id != self._thumb_request_id or child.image_removed:
+                    continue
                 path = getattr(child, "image_path", None)
                 if not path:
                     continue
-                thumb = load_thumbnail(path)
+                stat = child.image_stat
+                try:
+                    thumb = load_thumbnail(
+                        path,
+                        style=THUMB_STYLE,
+                        stat=stat,
+                        use_shared=self.settings["use_shared_thumbnails"],
+                        write_shared=self.settings["write_shared_thumbnails"],
+                    )
+                except Exception:
+                    continue
                 if thumb is None:
                     continue
-                thumb = round_pixbuf(thumb, 6)
-                thumb = add_border(thumb, 6, color=(1.0, 1.0, 1.0, 0.4), width_px=2.0)
-                GLib.idle_add(self._apply_thumb, child, thumb, request_id)
-
-        thread = threading.Thread(target=worker, daemon=True)
-        thread.start()
-
-    def _start_thumb_shimmer(self, children, request_id):
-        if len(self._thumb_placeholders) < 2:
-            return
-        if self._thumb_shimmer_id is not None:
-            return
-        state = {"index": 0}
+                self._post_thumb_result(child, thumb, request_id, stat)
+        finally:
+            if not released:
+                with self._thumb_lock:
+                    self._thumb_active_workers -= 1
+
+    def _post_thumb_result(self, child, thumb, request_id, stat):
+        # Results are applied once per frame from a tick callback instead of
+        # one idle callback each.
+        self._thumb_results.append((child, thumb, request_id, stat))
+        with self._thumb_lock:
+            if self._thumb_drain_scheduled:
+                return
+            self._thumb_drain_scheduled = True
+        GLib.idle_add(self._start_thumb_drain)
 
-        def tick():
-            if request_id != self._thumb_request_id:
-                self._thumb_shimmer_id = None
-                return False
-            any_pending = False
-            for child in children:
-                if request_id != self._thumb_request_id:
-                    self._thumb_shimmer_id = None
-                    return False
-                if getattr(child, "image_loaded", False):
-                    continue
-                any_pending = True
-                image = getattr(child, "image_widget", None)
-                if image is not None:
-                    image.set_from_pixbuf(self._thumb_placeholders[state["index"]])
-            if not any_pending:
-                self._thumb_shimmer_id = None
-                return False
-            state["index"] = (state["index"] + 1) % len(self._thumb_placeholders)
-            return True
+    def _start_thumb_drain(self):
+        self.thumb_scroll.add_tick_callback(self._drain_thumb_results)
+        return False
 
-        self._thumb_shimmer_id = GLib.timeout_add(140, tick)
+    def _drain_thumb_results(self, _widget, _frame_clock):
+        deadline = time.monotonic() + THUMB_APPLY_BUDGET
+        while self._thumb_results and time.monotonic() < deadline:
+            self._apply_thumb(*self._thumb_results.popleft())
+        with self._thumb_lock:
+            if self._thumb_results:
+                return True
+            self._thumb_drain_scheduled = False
+        return False
 
-    def _apply_thumb(self, child, pixbuf, request_id):
+    def _update_thumb_shimmer(self):
+        # Only pending cells in the viewport get the shared animation; the rest
+        # show a static frame, so off-screen cells cost nothing.
+        if self._thumb_placeholder_anim is None:
+            return
+        if self.get_mapped():
+            start, end = self._visible_thumb_range()
+            visible = self._thumb_children[start:end]
+        else:
+            visible = []
+        wanted = set()
+        for child in visible:
+            if child.image_loaded or child.image_widget is None:
+                continue
+            wanted.add(child)
+            if child not in self._thumb_animating:
+                child.image_widget.set_from_animation(self._thumb_placeholder_anim)
+        for child in self._thumb_animating - wanted:
+            if not child.image_loaded and child.image_widget is not None:
+                child.image_widget.set_from_pixbuf(self._thumb_placeholders[0])
+        self._thumb_animating = wanted
+
+    def _set_thumb_placeholder(self, child):
+        self._thumb_animating.discard(child)
+        if child.image_widget is not None:
+            child.image_widget.set_from_pixbuf(self._thumb_placeholders[0])
+
+    def _apply_thumb(self, child, pixbuf, request_id, stat=None):
         if request_id != self._thumb_request_id:
             return False
+        if stat is not None and stat is not child.image_stat:
+            return False
+        child.thumb_pixbuf = pixbuf
+        self._thumb_animating.discard(child)
         image = getattr(child, "image_widget", None)
         if image is not None:
             image.set_from_pixbuf(pixbuf)
             image.set_size_request(96, 64)
         child.image_loaded = True
+        self._thumb_loaded[child] = True
+        cap = self._thumb_loaded_cap()
+        if cap and len(self._thumb_loaded) > cap and self._thumb_budget_id is None:
+            self._thumb_budget_id = GLib.idle_add(self._enforce_thumb_budget)
+        return False
+
+    def _thumb_loaded_cap(self):
+        budget = self.settings["thumb_memory_mb"] * 1024 * 1024
+        return budget // (THUMB_SIZE[0] * THUMB_SIZE[1] * 4)
+
+    def _thumb_keep_range(self):
+        # Everything within one screenful of the viewport stays resident.
+        page = self.thumb_scroll.get_vadjustment().get_page_size()
+        margin_rows = int(page // self._thumb_row_pitch()) + 1
+        return self._visible_thumb_range(margin_rows)
+
+    def _enforce_thumb_budget(self):
+        self._thumb_budget_id = None
+        cap = self._thumb_loaded_cap()
+        if not cap or len(self._thumb_loaded) <= cap:
+            return False
+        start, end = self._thumb_keep_range()
+        cols = self._thumb_columns()
+        positions = {child: index for index, child in enumerate(self._thumb_children)}
+        candidates = []
+        for child in self._thumb_loaded:
+            index = positions.get(child)
+            if index is None or start <= index < end:
+                continue
+            if index < start:
+                distance = (start - index) // cols
+            else:
+                distance = (index - end) // cols
+            candidates.append((distance, child))
+        candidates.sort(key=lambda item: item[0], reverse=True)
+        excess = len(self._thumb_loaded) - int(cap * 0.9)
+        for _distance, child in candidates[:excess]:
+            self._unload_thumb(child)
         return False
 
+    def _unload_thumb(self, child):
+        self._thumb_loaded.pop(child, None)
+        child.thumb_pixbuf = None
+        child.image_loaded = False
+        child.thumb_requested = False
+        self._set_thumb_placeholder(child)
+
+    def _requeue_visible_thumbs(self):
+        # Thumbnails dropped by the memory budget come back from the cache
+        # once they scroll near the viewport again.
+        start, end = self._thumb_keep_range()
+        missing = [
+            child
+            for child in self._thumb_children[start:end]
+            if not child.image_loaded and not child.thumb_requested
+        ]
+        if missing:
+            self._start_thumb_loader(missing, self._thumb_request_id)
+
     def _on_thumb_activated(self, _flowbox, child):
         self._set_preview_from_child(child)
 
@@ -1009,31 +2994,181 @@ class MatugenWindow(Gtk.Window):
         path = getattr(child, "image_path", None)
         if not path:
             return
-        self._set_preview_image(path, fade=fade_preview)
-        self._run_matugen(path, palette_fade_ms=120 if fade_preview else 500)
+        self._preview_child = child
+        stat = getattr(child, "image_stat", None)
+        # Cheap feedback now; the decode and matugen wait until the
+        # selection stops moving, and anything older is cancelled.
+        self._cancel_matugen()
+        self._cancel_palette_explore()
+        self._palette_rerun_pending = False
+        self._set_preview_image(
+            path,
+            stat,
+            fade=fade_preview,
+            stand_in=child if self.settings["progressive_preview"] else None,
+            defer=True,
+        )
+        if self._selection_settle_id is not None:
+            GLib.source_remove(self._selection_settle_id)
+            self._selection_settle_id = None
+        delay = self.settings["selection_debounce_ms"]
+        if delay <= 0:
+            self._settle_selection(child, fade_preview)
+        else:
+            self._selection_settle_id = GLib.timeout_add(
+                delay, self._settle_selection, child, fade_preview
+            )
+
+    def _settle_selection(self, child, fade_preview):
+        self._selection_settle_id = None
+        if child is not self._preview_child:
+            return False
+        pending = self._preview_pending
+        self._preview_pending = None
+        if pending is not None:
+            self._start_preview_decode(*pending)
+        self._run_matugen(
+            child.image_path,
+            palette_fade_ms=120 if fade_preview else 500,
+            stat=getattr(child, "image_stat", None),
+        )
+        return False
 
-    def _set_preview_image(self, path, fade=True):
+    def _cached_thumb_pixbuf(self, child):
+        if child.thumb_pixbuf is not None:
+            return child.thumb_pixbuf
+        stat = getattr(child, "image_stat", None)
+        if stat is None:
+            return None
+        cached = thumbnail_store().get(thumbnail_cache_key(stat, THUMB_SIZE, THUMB_STYLE))
+        if cached is None:
+            return None
         try:
-            pixbuf = GdkPixbuf.Pixbuf.new_from_file(path)
+            return pixbuf_from_rgba_bytes(*cached)
         except Exception:
+            return None
+
+    def _set_preview_image(self, path, stat=None, fade=True, stand_in=None, defer=False):
+        self._preview_request_id += 1
+        request_id = self._preview_request_id
+        # Let the current selection have the decoder to itself.
+        self._prefetch_id += 1
+        self._preview_pending = None
+        key = preview_cache_key(path, stat)
+        cached = self._preview_cache.get(key)
+        if cached is not None:
+            self._apply_preview(cached, request_id, fade)
             return
-        height = 360
-        if pixbuf.get_height() > 0:
-            scale = height / float(pixbuf.get_height())
-            width = max(1, int(pixbuf.get_width() * scale))
-        else:
-            width = 1
-        scaled = pixbuf.scale_simple(width, height, GdkPixbuf.InterpType.BILINEAR)
-        if scaled is None:
+        if stand_in is not None:
+            self._start_progressive_preview(stand_in, path, request_id)
+        if defer:
+            self._preview_pending = (path, key, request_id, fade)
             return
-        scaled = round_pixbuf(scaled, 16)
-        scaled = add_border(scaled, 16, color=(1.0, 1.0, 1.0, 0.4), width_px=2.0)
+        self._start_preview_decode(path, key, request_id, fade)
+
+    def _start_preview_decode(self, path, key, request_id, fade):
+        if request_id != self._preview_request_id:
+            return
+
+        def is_cancelled():
+            return request_id != self._preview_request_id
+
+        def worker():
+            scaled = load_preview_pixbuf(path, PREVIEW_HEIGHT, is_cancelled)
+            if scaled is None or is_cancelled():
+                return
+            scaled = style_thumbnail(scaled, PREVIEW_STYLE)
+            self._preview_cache.put(key, scaled)
+            GLib.idle_add(self._apply_preview, scaled, request_id, fade)
+
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+
+    def _start_progressive_preview(self, child, path, request_id):
+        # Header parsing and the cairo passes stay off the main thread.
+        def worker():
+            thumb = self._cached_thumb_pixbuf(child)
+            if thumb is None or request_id != self._preview_request_id:
+                return
+            try:
+                pixbuf = progressive_preview_pixbuf(thumb, path, PREVIEW_HEIGHT)
+            except Exception:
+                return
+            if pixbuf is not None:
+                GLib.idle_add(self._show_progressive_preview, pixbuf, request_id)
+
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+
+    def _show_progressive_preview(self, pixbuf, request_id):
+        if request_id != self._preview_request_id or request_id == self._preview_shown_id:
+            return False
+        # Cancel any fade still running from the previous selection.
+        if not hasattr(self, "_fade_jobs"):
+            self._fade_jobs = {}
+        self._fade_jobs[self.preview_image] = self._fade_jobs.get(self.preview_image, 0) + 1
+        self.preview_image.set_opacity(1.0)
+        self.preview_image.set_from_pixbuf(pixbuf)
+        self._preview_stand_in_id = request_id
+        return False
+
+    def _apply_preview(self, scaled, request_id, fade):
+        if request_id != self._preview_request_id:
+            return False
+        self._preview_shown_id = request_id
+        if request_id == self._preview_stand_in_id:
+            # The stand-in is already on screen; refine it in place.
+            fade = False
         def apply_pixbuf():
             self.preview_image.set_from_pixbuf(scaled)
         if fade:
             self._fade_widget(self.preview_image, apply_pixbuf, duration_ms=550)
         else:
             apply_pixbuf()
+        self._prefetch_preview_neighbours()
+        return False
+
+    def _prefetch_preview_neighbours(self):
+        # Warm the cache for wherever the arrow keys can go next.
+        child = self._preview_child
+        if child is None or not self._preview_cache.max_bytes:
+            return
+        try:
+            index = self._thumb_children.index(child)
+        except ValueError:
+            return
+        total = len(self._thumb_children)
+        cols = self._thumb_columns()
+        targets = []
+        for direction in ("right", "down", "left", "up"):
+            neighbour = self._thumb_children[
+                thumb_index_in_direction(index, total, cols, direction)
+            ]
+            if neighbour is child:
+                continue
+            key = preview_cache_key(neighbour.image_path, neighbour.image_stat)
+            if key in self._preview_cache or any(key == item[1] for item in targets):
+                continue
+            targets.append((neighbour.image_path, key))
+        if not targets:
+            return
+        self._prefetch_id += 1
+        generation = self._prefetch_id
+
+        def is_cancelled():
+            return generation != self._prefetch_id
+
+        def worker():
+            for path, key in targets:
+                if is_cancelled():
+                    return
+                scaled = load_preview_pixbuf(path, PREVIEW_HEIGHT, is_cancelled)
+                if scaled is None:
+                    continue
+                self._preview_cache.put(key, style_thumbnail(scaled, PREVIEW_STYLE))
+
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
 
     def _fade_widget(self, widget, update_func, duration_ms=900):
         if not hasattr(self, "_fade_jobs"):
@@ -1167,11 +3302,49 @@ class MatugenWindow(Gtk.Window):
             self._rerun_matugen()
 
     def _on_contrast_changed(self, scale):
+        # Drags fire on every step; only the value the slider settles on
+        # (quiet period or button release) reaches matugen and the disk.
         value = int(scale.get_value())
         self.settings["contrast"] = value
         self.contrast_value.set_text(str(value))
+        self._save_settings_later()
+        if self._contrast_settle_id is not None:
+            GLib.source_remove(self._contrast_settle_id)
+        self._contrast_settle_id = GLib.timeout_add(
+            self.settings["contrast_settle_ms"], self._settle_contrast
+        )
+
+    def _on_contrast_released(self, _scale, _event):
+        if self._contrast_settle_id is not None:
+            GLib.source_remove(self._contrast_settle_id)
+            self._settle_contrast()
+        return False
+
+    def _settle_contrast(self):
+        self._contrast_settle_id = None
+        if self.settings["contrast"] == self._contrast_applied:
+            return False
+        self._contrast_applied = self.settings["contrast"]
+        # Explore runs for the old contrast are now pointless extra processes.
+        self._cancel_palette_explore()
+        if self._palette_jobs:
+            # Let the running job finish (it still feeds the cache) and run
+            # the latest value after it.
+            self._palette_rerun_pending = True
+        else:
+            self._rerun_matugen()
+        return False
+
+    def _save_settings_later(self):
+        if self._settings_save_id is None:
+            self._settings_save_id = GLib.timeout_add(500, self._save_settings_now)
+
+    def _save_settings_now(self):
+        if self._settings_save_id is not None:
+            GLib.source_remove(self._settings_save_id)
+            self._settings_save_id = None
         save_settings(self.settings)
-        self._rerun_matugen()
+        return False
 
     def _make_combo_row(self, label_text, options, active_value, key):
         row = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=4)
@@ -1318,10 +3491,13 @@ class MatugenWindow(Gtk.Window):
         return ""
 
     def _rerun_matugen(self):
-        selected = self.thumb_flow.get_selected_children()
-        if not selected:
+        selected = self._selected_thumb()
+        if selected is None:
             return
-        self._set_preview_from_child(selected[0], fade_preview=False)
+        # Only the palette depends on theme/mode/contrast; the preview stays.
+        self._run_matugen(
+            selected.image_path, stat=getattr(selected, "image_stat", None)
+        )
 
     def _open_settings_window(self, _button=None):
         if self.settings_window is not None:
@@ -1371,7 +3547,8 @@ class MatugenWindow(Gtk.Window):
 
     def _on_settings_apply_close(self, _button):
         save_settings(self.settings)
-        if self.settings["images_folder"] != self._current_folder:
+        folder = os.path.normpath(os.path.abspath(self.settings["images_folder"]))
+        if folder != self._current_folder:
             self._load_images(self.settings["images_folder"], fade_preview=False)
         else:
             self._rerun_matugen()
@@ -1387,45 +3564,190 @@ class MatugenWindow(Gtk.Window):
             return True
         return False
 
-    def _run_matugen(self, path, palette_fade_ms=500):
-        self._request_id += 1
+    def _run_matugen(self, path, palette_fade_ms=500, stat=None):
+        self._cancel_matugen()
         request_id = self._request_id
         if not hasattr(self, "_palette_fades"):
             self._palette_fades = {}
         self._palette_fades[request_id] = palette_fade_ms
+        theme = self.settings["theme"]
+        mode = self.settings["mode"]
+        contrast = self.settings["contrast"]
+        self._palette_source = (path, stat)
+        key = palette_cache_key(path, stat, theme, mode, contrast)
+        cached = palette_cache().get(key) if key else None
+        if cached is not None:
+            self._update_palette(cached, request_id)
+            return
+        if self._use_numpy_backend():
+            self._run_numpy_palette(path, stat, theme, mode, contrast, request_id)
+            return
+
+        def start(args):
+            with self._matugen_lock:
+                if request_id != self._request_id:
+                    return None
+                proc = spawn_matugen(args)
+                self._matugen_procs[request_id] = proc
+                return proc
+
+        use_proxy = self.settings["matugen_proxy"]
+        self._palette_jobs += 1
 
         def worker():
             try:
-                args = [
-                    resolve_binary("matugen"),
-                    "image",
-                    path,
-                    "--dry-run",
-                    "--show-colors",
-                    "-t",
-                    self.settings["theme"],
-                    "-m",
-                    self.settings["mode"],
-                    "--contrast",
-                    str(self.settings["contrast"]),
-                ]
-                result = subprocess.run(
-                    args, capture_output=True, text=True, check=False
-                )
-                output = (result.stdout or "") + "\n" + (result.stderr or "")
-                palette = parse_matugen_output(output, self.settings["mode"])
+                source = matugen_source(path, stat, use_proxy)
+                try:
+                    palettes = run_matugen_preview(source, theme, mode, contrast, start)
+                finally:
+                    with self._matugen_lock:
+                        self._matugen_procs.pop(request_id, None)
+                if palettes is None or request_id != self._request_id:
+                    return
+                if palettes:
+                    # One run covers both modes, so a mode switch is a cache hit.
+                    store_matugen_palettes(path, stat, theme, contrast, palettes)
+                    GLib.idle_add(self._schedule_palette_flush)
+                palette = palettes.get(mode, {})
             except Exception:
                 palette = {}
             GLib.idle_add(self._update_palette, palette, request_id)
 
+        def run():
+            try:
+                worker()
+            finally:
+                GLib.idle_add(self._palette_job_done)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+
+    def _palette_job_done(self):
+        self._palette_jobs -= 1
+        if self._palette_rerun_pending and not self._palette_jobs:
+            self._palette_rerun_pending = False
+            self._rerun_matugen()
+        return False
+
+    def _use_numpy_backend(self):
+        return HAVE_NUMPY and self.settings["preview_backend"] == "numpy"
+
+    def _run_numpy_palette(self, path, stat, theme, mode, contrast, request_id):
+        # Live previews only; Apply still goes through matugen itself.
+        def worker():
+            palette = {}
+            try:
+                pixbuf = self._preview_cache.get(preview_cache_key(path, stat))
+                if pixbuf is None:
+                    pixbuf = load_preview_pixbuf(
+                        path,
+                        PALETTE_SOURCE_HEIGHT,
+                        lambda: request_id != self._request_id,
+                    )
+                if pixbuf is not None and request_id == self._request_id:
+                    palette = numpy_palette(pixbuf, theme, mode, contrast)
+            except Exception:
+                palette = {}
+            if request_id == self._request_id:
+                GLib.idle_add(self._update_palette, palette, request_id)
+
         thread = threading.Thread(target=worker, daemon=True)
         thread.start()
 
+    def _start_palette_explore(self, path, stat):
+        # Fill the cache with every theme/mode for this image so flipping
+        # through the combos is answered from the cache.
+        jobs = self.settings["palette_explore_jobs"]
+        contrast = self.settings["contrast"]
+        token = (path, getattr(stat, "st_mtime_ns", 0), contrast)
+        if jobs <= 0 or token == self._explore_token or self._use_numpy_backend():
+            return
+        self._cancel_palette_explore()
+        self._explore_token = token
+        explore_id = self._explore_id
+        current = self.settings["mode"]
+        modes = [current] + [mode for mode in MATUGEN_MODES if mode != current]
+        cache = palette_cache()
+        pending = collections.deque()
+        for mode in modes:
+            for theme in MATUGEN_THEMES:
+                key = palette_cache_key(path, stat, theme, mode, contrast)
+                if key and key not in cache:
+                    pending.append((theme, mode, key))
+
+        def start(args):
+            with self._matugen_lock:
+                if explore_id != self._explore_id:
+                    return None
+                finished = [proc for proc in self._explore_procs if proc.returncode is not None]
+                self._explore_procs.difference_update(finished)
+                proc = spawn_matugen(args)
+                self._explore_procs.add(proc)
+                return proc
+
+        use_proxy = self.settings["matugen_proxy"]
+
+        def worker():
+            source = matugen_source(path, stat, use_proxy)
+            while True:
+                with self._matugen_lock:
+                    if explore_id != self._explore_id or not pending:
+                        return
+                    theme, mode, key = pending.popleft()
+                # An earlier run for the other mode may already have filled it.
+                if key in cache:
+                    continue
+                try:
+                    palettes = run_matugen_preview(source, theme, mode, contrast, start)
+                except Exception:
+                    return
+                if not palettes or explore_id != self._explore_id:
+                    continue
+                store_matugen_palettes(path, stat, theme, contrast, palettes)
+                GLib.idle_add(self._schedule_palette_flush)
+
+        for _index in range(min(jobs, len(pending))):
+            threading.Thread(target=worker, daemon=True).start()
+
+    def _cancel_palette_explore(self):
+        with self._matugen_lock:
+            self._explore_id += 1
+            self._explore_token = None
+            procs = list(self._explore_procs)
+            self._explore_procs.clear()
+        for proc in procs:
+            try:
+                proc.kill()
+            except Exception:
+                pass
+
+    def _schedule_palette_flush(self):
+        if self._palette_flush_id is None:
+            self._palette_flush_id = GLib.timeout_add_seconds(5, self._flush_palette_cache)
+        return False
+
+    def _flush_palette_cache(self):
+        self._palette_flush_id = None
+        palette_cache().flush()
+        return False
+
+    def _cancel_matugen(self):
+        # Bumping the id hides late results; killing stops the work itself.
+        with self._matugen_lock:
+            self._request_id += 1
+            procs = list(self._matugen_procs.values())
+            self._matugen_procs.clear()
+        for proc in procs:
+            try:
+                proc.kill()
+            except Exception:
+                pass
+
     def _apply_matugen(self, _button):
-        selected = self.thumb_flow.get_selected_children()
-        if not selected:
+        selected = self._selected_thumb()
+        if selected is None:
             return
-        path = getattr(selected[0], "image_path", None)
+        path = getattr(selected, "image_path", None)
         if not path:
             return
         # Ensure matugen has wallpaper settings so it can call swww.
@@ -1475,6 +3797,9 @@ class MatugenWindow(Gtk.Window):
         self._fade_widget(self.palette_grid, lambda: None, duration_ms=fade_ms)
         self._apply_palette_style(palette)
         self._update_sparkle_colors(palette)
+        # A pending rerun will compute this contrast itself; explore after it.
+        if self._palette_source is not None and not self._palette_rerun_pending:
+            self._start_palette_explore(*self._palette_source)
         return False
 
     def _apply_palette_style(self, palette):
@@ -1514,7 +3839,8 @@ class MatugenWindow(Gtk.Window):
             background-color: %s;
             border-color: %s;
         }
-        .palette-window flowboxchild:selected {
+        .palette-window flowboxchild:selected,
+        .palette-window .thumb-cell-selected {
             background-color: %s;
             border-radius: 8px;
         }
@@ -1738,12 +4064,11 @@ class MatugenWindow(Gtk.Window):
         return False
 
     def _select_thumb_direction(self, direction):
-        children = self.thumb_flow.get_children()
+        children = self._thumb_children
         if not children:
             return
-        selected = self.thumb_flow.get_selected_children()
-        if selected:
-            current = selected[0]
+        current = self._selected_thumb()
+        if current is not None:
             try:
                 index = children.index(current)
             except ValueError:
@@ -1751,37 +4076,11 @@ class MatugenWindow(Gtk.Window):
         else:
             index = 0
 
-        cols = self.thumb_flow.get_max_children_per_line()
-        if cols <= 0:
-            cols = 4
-        total = len(children)
-        rows = max(1, (total + cols - 1) // cols)
-        row = index // cols
-        col = index % cols
-
-        if direction == "left":
-            if col > 0:
-                col -= 1
-            else:
-                row = (row - 1) % rows
-                col = min(cols - 1, total - 1 - row * cols)
-        elif direction == "right":
-            row_len = min(cols, total - row * cols)
-            if col < row_len - 1:
-                col += 1
-            else:
-                row = (row + 1) % rows
-                col = 0
-        elif direction == "up":
-            row = (row - 1) % rows
-        elif direction == "down":
-            row = (row + 1) % rows
-
-        row_len = min(cols, total - row * cols)
-        col = min(col, max(0, row_len - 1))
-        new_index = row * cols + col
+        new_index = thumb_index_in_direction(
+            index, len(children), self._thumb_columns(), direction
+        )
         new_child = children[new_index]
-        self.thumb_flow.select_child(new_child)
+        self._select_thumb(new_child)
         self._set_preview_from_child(new_child)
 
     def _toggle_settings_panel(self, _button):
@@ -1814,7 +4113,45 @@ class MatugenWindow(Gtk.Window):
 
 
 
-def main():
+def positive_int(value):
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("not a number: %s" % value)
+    if number < 1:
+        raise argparse.ArgumentTypeError("must be at least 1: %s" % value)
+    return number
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="jasmine")
+    commands = parser.add_subparsers(dest="command")
+    warm = commands.add_parser(
+        "warm", help="fill the thumbnail cache for a folder without opening a window"
+    )
+    warm.add_argument("folder", nargs="?", help="defaults to images_folder from settings.ini")
+    warm.add_argument(
+        "-j", "--jobs", type=positive_int, default=None, help="worker processes"
+    )
+    warm.add_argument(
+        "--palettes",
+        action="store_true",
+        help="also cache matugen palettes for the current theme, mode and contrast",
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "warm":
+        settings = load_settings()
+        folder = os.path.expanduser(args.folder or settings["images_folder"])
+        if not os.path.isdir(folder):
+            parser.error("not a folder: %s" % folder)
+        count = warm_thumbnail_cache(folder, jobs=args.jobs, settings=settings)
+        print("jasmine: cached %d new thumbnails in %s" % (count, folder))
+        if args.palettes:
+            count = warm_palette_cache(folder, jobs=args.jobs, settings=settings)
+            print("jasmine: cached %d new palettes in %s" % (count, folder))
+        return
+
     window = MatugenWindow()
     window.connect("destroy", Gtk.main_quit)
     window.show_all()